@@ -0,0 +1,99 @@
+"""Estimate storage for per-user engagement bitmaps at scale.
+
+Item popularity follows a Zipf distribution over ``--items`` items with
+``--engagements`` actions in total from ``--users`` distinct users. Building
+every bitmap would take too long in pure Python, so a log-spaced sample of
+popularity ranks is built for real and each sampled rank stands in for the
+ranks around it. The total is compared with storing the same ids as a
+Postgres ``integer[]`` (4 bytes each plus a 24 byte header) and as Python
+sets, and membership checks on the sampled bitmaps are timed. Each action
+rewrites the stored row holding its user, so the average bytes rewritten per
+action are reported for one row per container (the layout in
+``engagement_bitmaps``) and for one row per whole bitmap.
+
+    python bench_engagement_bitmaps.py --users 1000000 --items 100000
+"""
+import argparse
+import math
+import random
+import sys
+import time
+
+from bitmaps import RoaringBitmap
+
+PG_ARRAY_HEADER = 24
+PG_INT_BYTES = 4
+
+
+def zipf_counts(items: int, engagements: int, users: int, exponent: float):
+    harmonic = sum(1.0 / rank ** exponent for rank in range(1, items + 1))
+    scale = engagements / harmonic
+    return lambda rank: min(users, max(1, round(scale / rank ** exponent)))
+
+
+def sample_ranks(items: int, samples: int):
+    ranks = sorted({max(1, min(items, round(math.exp(i * math.log(items) / (samples - 1))))) for i in range(samples)})
+    # Each sampled rank represents the ranks up to the next sample
+    return [(rank, (ranks[i + 1] if i + 1 < len(ranks) else items + 1) - rank) for i, rank in enumerate(ranks)]
+
+
+def set_bytes(values: set) -> int:
+    return sys.getsizeof(values) + sum(sys.getsizeof(v) for v in values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--engagements", type=int, default=50_000_000, help="total actions across all items")
+    parser.add_argument("--zipf", type=float, default=1.0, help="popularity skew exponent")
+    parser.add_argument("--samples", type=int, default=60, help="popularity ranks to build for real")
+    parser.add_argument("--lookups", type=int, default=100_000, help="membership checks to time")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    count_for = zipf_counts(args.items, args.engagements, args.users, args.zipf)
+    total_ids = bitmap_bytes = array_bytes = set_estimate = 0
+    whole_writes = container_writes = 0
+    built = []
+    print(f"{'rank':>8} {'users':>9} {'bitmap B':>10} {'int[] B':>10} {'B/user':>7}")
+    started = time.perf_counter()
+    for rank, weight in sample_ranks(args.items, args.samples):
+        count = count_for(rank)
+        ids = rng.sample(range(1, args.users + 1), count)
+        bitmap = RoaringBitmap.from_values(ids)
+        size = len(bitmap.serialize())
+        pg_size = PG_ARRAY_HEADER + PG_INT_BYTES * count
+        # Python sets are only measured on small items; the per-id cost is flat beyond that
+        per_id_set = set_bytes(set(ids[:10_000])) / min(count, 10_000)
+        total_ids += count * weight
+        bitmap_bytes += size * weight
+        array_bytes += pg_size * weight
+        set_estimate += per_id_set * count * weight
+        whole_writes += size * count * weight
+        container_writes += sum(len(part) * len(part.serialize()) for part in bitmap.containers().values()) * weight
+        built.append(bitmap)
+        print(f"{rank:8d} {count:9d} {size:10d} {pg_size:10d} {size / count:7.2f}")
+    build_seconds = time.perf_counter() - started
+
+    probes = [rng.randrange(1, args.users + 1) for _ in range(args.lookups)]
+    targets = [rng.choice(built) for _ in range(args.lookups)]
+    started = time.perf_counter()
+    hits = sum(1 for bitmap, user_id in zip(targets, probes) if user_id in bitmap)
+    lookup_ns = (time.perf_counter() - started) / args.lookups * 1e9
+
+    mib = 1024 * 1024
+    print()
+    print(f"users={args.users:,} items={args.items:,} engagements~{total_ids:,.0f} zipf={args.zipf}")
+    print(f"bitmaps (serialized): {bitmap_bytes / mib:10.1f} MiB  ({bitmap_bytes / total_ids:.2f} B/engagement)")
+    print(f"postgres integer[]:   {array_bytes / mib:10.1f} MiB  ({array_bytes / total_ids:.2f} B/engagement)")
+    print(f"python sets:          {set_estimate / mib:10.1f} MiB  ({set_estimate / total_ids:.2f} B/engagement)")
+    print(f"rewritten per action: {container_writes / total_ids:10.0f} B per container row, "
+          f"{whole_writes / total_ids:,.0f} B per whole-bitmap row")
+    print(f"membership check:     {lookup_ns:10.0f} ns  ({hits} hits in {args.lookups:,} probes)")
+    print(f"sample build time:    {build_seconds:10.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Compressed bitmap of 32-bit unsigned integers (user ids).
+
+Same layout idea as Roaring bitmaps: ids are split into a 16-bit high part
+selecting a container and a 16-bit low part stored inside it. Sparse
+containers are sorted ``array('H')`` (2 bytes per id); once a container
+holds more than 4096 ids it switches to a fixed 8 KiB bitset, which is
+smaller from that point on. Membership and insertion are O(1) for bitsets and
+O(log 4096) for arrays; cardinality is tracked incrementally.
+"""
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, Union
+
+ARRAY_MAX = 4096
+BITSET_BYTES = 8192
+_MAGIC = b"RB1"
+_HEADER = struct.Struct("<3sI")
+_CONTAINER = struct.Struct("<HBI")
+_ARRAY, _BITSET = 0, 1
+
+Container = Union[array, bytearray]
+
+
+class RoaringBitmap:
+    __slots__ = ("_containers", "_sizes", "_cardinality")
+
+    def __init__(self, values=()):
+        self._containers: Dict[int, Container] = {}
+        self._sizes: Dict[int, int] = {}
+        self._cardinality = 0
+        for value in values:
+            self.add(value)
+
+    @classmethod
+    def from_values(cls, values) -> "RoaringBitmap":
+        """Bulk-build from any iterable of ids, much faster than repeated ``add``."""
+        bitmap = cls()
+        groups: Dict[int, list] = {}
+        for value in sorted(set(values)):
+            if not 0 <= value <= 0xFFFFFFFF:
+                raise ValueError("bitmap values must be 32-bit unsigned integers")
+            groups.setdefault(value >> 16, []).append(value & 0xFFFF)
+        for high, lows in groups.items():
+            container = array("H", lows)
+            bitmap._containers[high] = cls._to_bitset(container) if len(lows) > ARRAY_MAX else container
+            bitmap._sizes[high] = len(lows)
+            bitmap._cardinality += len(lows)
+        return bitmap
+
+    def __len__(self) -> int:
+        return self._cardinality
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, bytearray):
+            return bool(container[low >> 3] & (1 << (low & 7)))
+        i = bisect_left(container, low)
+        return i < len(container) and container[i] == low
+
+    def add(self, value: int) -> bool:
+        """Add value; returns False if it was already present."""
+        if not 0 <= value <= 0xFFFFFFFF:
+            raise ValueError("bitmap values must be 32-bit unsigned integers")
+        high, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(high)
+        if container is None:
+            container = self._containers[high] = array("H")
+            self._sizes[high] = 0
+        if isinstance(container, bytearray):
+            byte, bit = low >> 3, 1 << (low & 7)
+            if container[byte] & bit:
+                return False
+            container[byte] |= bit
+        else:
+            i = bisect_left(container, low)
+            if i < len(container) and container[i] == low:
+                return False
+            container.insert(i, low)
+            if len(container) > ARRAY_MAX:
+                self._containers[high] = self._to_bitset(container)
+        self._sizes[high] += 1
+        self._cardinality += 1
+        return True
+
+    def discard(self, value: int) -> bool:
+        """Remove value; returns False if it was not present."""
+        high, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(high)
+        if container is None:
+            return False
+        if isinstance(container, bytearray):
+            byte, bit = low >> 3, 1 << (low & 7)
+            if not container[byte] & bit:
+                return False
+            container[byte] &= ~bit
+            if self._sizes[high] - 1 <= ARRAY_MAX:
+                self._containers[high] = self._to_array(container)
+        else:
+            i = bisect_left(container, low)
+            if i == len(container) or container[i] != low:
+                return False
+            del container[i]
+        self._sizes[high] -= 1
+        self._cardinality -= 1
+        if self._sizes[high] == 0:
+            del self._containers[high]
+            del self._sizes[high]
+        return True
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            base = high << 16
+            if isinstance(container, bytearray):
+                for byte_index, byte in enumerate(container):
+                    while byte:
+                        lowest = byte & -byte
+                        yield base | (byte_index << 3) | (lowest.bit_length() - 1)
+                        byte ^= lowest
+            else:
+                for low in container:
+                    yield base | low
+
+    def containers(self) -> Dict[int, "RoaringBitmap"]:
+        """One single-container bitmap per high 16 bits, keyed by them."""
+        split = {}
+        for high, container in self._containers.items():
+            part = RoaringBitmap()
+            part._containers[high] = container[:]
+            part._sizes[high] = part._cardinality = self._sizes[high]
+            split[high] = part
+        return split
+
+    @staticmethod
+    def _to_bitset(values: array) -> bytearray:
+        bits = bytearray(BITSET_BYTES)
+        for low in values:
+            bits[low >> 3] |= 1 << (low & 7)
+        return bits
+
+    @staticmethod
+    def _to_array(bits: bytearray) -> array:
+        values = array("H")
+        for byte_index, byte in enumerate(bits):
+            while byte:
+                lowest = byte & -byte
+                values.append((byte_index << 3) | (lowest.bit_length() - 1))
+                byte ^= lowest
+        return values
+
+    def nbytes(self) -> int:
+        """Approximate payload size, excluding Python object overhead."""
+        return sum(
+            BITSET_BYTES if isinstance(c, bytearray) else 2 * len(c)
+            for c in self._containers.values()
+        )
+
+    def serialize(self) -> bytes:
+        parts = [_HEADER.pack(_MAGIC, len(self._containers))]
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            if isinstance(container, bytearray):
+                parts.append(_CONTAINER.pack(high, _BITSET, self._sizes[high]))
+                parts.append(bytes(container))
+            else:
+                parts.append(_CONTAINER.pack(high, _ARRAY, self._sizes[high]))
+                if sys.byteorder == "big":
+                    container = array("H", container)
+                    container.byteswap()
+                parts.append(container.tobytes())
+        return b"".join(parts)
+
+    @classmethod
+    def deserialize(cls, data: bytes) -> "RoaringBitmap":
+        bitmap = cls()
+        if not data:
+            return bitmap
+        magic, count = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC:
+            raise ValueError("not a serialized RoaringBitmap")
+        offset = _HEADER.size
+        for _ in range(count):
+            high, kind, size = _CONTAINER.unpack_from(data, offset)
+            offset += _CONTAINER.size
+            if kind == _BITSET:
+                container = bytearray(data[offset:offset + BITSET_BYTES])
+                offset += BITSET_BYTES
+            else:
+                container = array("H")
+                container.frombytes(data[offset:offset + 2 * size])
+                if sys.byteorder == "big":
+                    container.byteswap()
+                offset += 2 * size
+            bitmap._containers[high] = container
+            bitmap._sizes[high] = size
+            bitmap._cardinality += size
+        return bitmap
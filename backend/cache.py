@@ -0,0 +1,147 @@
+"""Result cache for the list and search endpoints.
+
+Two tiers: an in-process LRU with TTL and entry-count eviction, and an
+optional shared tier speaking the Redis protocol (``REDIS_URL``). Keys embed a
+per-table version counter; write paths call ``bump`` after commit so entries
+computed before an edit are never read again and simply age out.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "60"))
+CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "1024"))
+REDIS_URL = os.getenv("REDIS_URL")
+KEY_PREFIX = "research_hub"
+
+
+class LRUCache:
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ResultCache:
+    def __init__(self, local: Optional[LRUCache] = None, shared=None, ttl: float = CACHE_TTL_SECONDS):
+        self.local = local if local is not None else LRUCache(ttl=ttl)
+        # Anything with redis-py's get/set/incr works here, e.g. a fakeredis instance in tests
+        self.shared = shared
+        self.ttl = ttl
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version_key(self, table: str) -> str:
+        return f"{KEY_PREFIX}:version:{table}"
+
+    def version(self, table: str) -> int:
+        if self.shared is not None:
+            try:
+                return int(self.shared.get(self._version_key(table)) or 0)
+            except Exception:
+                logger.warning("Shared cache unavailable, using local version for %s", table)
+        return self._versions.get(table, 0)
+
+    def bump(self, table: str, local_only: bool = False):
+        with self._lock:
+            self._versions[table] = self._versions.get(table, 0) + 1
+        if self.shared is not None and not local_only:
+            try:
+                self.shared.incr(self._version_key(table))
+            except Exception:
+                logger.warning("Could not bump shared version for %s", table)
+
+    def get_or_compute(self, table: str, key: str, compute: Callable[[], Any]) -> Any:
+        full_key = f"{KEY_PREFIX}:result:{table}:{self.version(table)}:{key}"
+
+        value = self.local.get(full_key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        if self.shared is not None:
+            try:
+                raw = self.shared.get(full_key)
+            except Exception:
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(full_key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        value = compute()
+        self.local.set(full_key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(full_key, json.dumps(value, default=str), ex=max(1, int(self.ttl)))
+            except Exception:
+                logger.warning("Could not write shared cache entry")
+        return value
+
+
+def make_key(endpoint: str, **params) -> str:
+    """Normalize query parameters so equivalent requests share an entry."""
+    normalized = {}
+    for name, value in params.items():
+        if value is None or value == []:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            # Tag/field filters are AND-ed, so their order doesn't matter
+            value = sorted(str(v) for v in value)
+        elif hasattr(value, "isoformat"):
+            value = value.isoformat()
+        elif hasattr(value, "value"):
+            value = value.value
+        normalized[name] = value
+    return f"{endpoint}?{json.dumps(normalized, sort_keys=True, default=str)}"
+
+
+def _shared_client():
+    if not REDIS_URL:
+        return None
+    try:
+        import redis
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed")
+        return None
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=0.1, socket_connect_timeout=0.1)
+
+
+results = ResultCache(shared=_shared_client())
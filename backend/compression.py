@@ -0,0 +1,221 @@
+"""Response compression middleware.
+
+Negotiates brotli or zstd when those packages are installed, and gzip
+otherwise. Bodies below ``COMPRESSION_MIN_SIZE`` or with a non-textual content
+type are passed through untouched. For the hot cacheable endpoints the
+compressed bytes are kept in a small LRU keyed by a digest of the
+uncompressed body, so identical payloads are compressed only once.
+"""
+import hashlib
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+# Server-sent events must reach the client as soon as they are written
+EXCLUDED_TYPES = ("text/event-stream",)
+
+CACHEABLE_PATHS = {
+    "/events/",
+    "/opportunities/",
+    "/events/stats/",
+    "/opportunities/stats/",
+}
+
+
+def available_encodings() -> List[str]:
+    encodings = []
+    if brotli is not None:
+        encodings.append("br")
+    if zstandard is not None:
+        encodings.append("zstd")
+    encodings.append("gzip")
+    return encodings
+
+
+class _Encoder:
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=4 if level is None else level)
+            self.compress, self.flush = self._obj.process, self._obj.finish
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=3 if level is None else level).compressobj()
+            self.compress, self.flush = self._obj.compress, self._obj.flush
+        else:
+            self._obj = zlib.compressobj(6 if level is None else level, zlib.DEFLATED, 31)
+            self.compress, self.flush = self._obj.compress, self._obj.flush
+
+
+# Cached payloads are compressed once and served many times, so they get a higher level
+_CACHE_LEVELS = {"br": 9, "zstd": 10, "gzip": 9}
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    encoder = _Encoder(encoding, level)
+    return encoder.compress(body) + encoder.flush()
+
+
+class CompressedPayloadCache:
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compress(self, body: bytes, encoding: str) -> bytes:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        compressed = compress(body, encoding, _CACHE_LEVELS.get(encoding))
+        if len(compressed) > self.max_bytes:
+            return compressed
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = compressed
+                self._size += len(compressed)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        return compressed
+
+
+def _choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _is_compressible(content_type: str) -> bool:
+    content_type = content_type.lower()
+    if content_type.startswith(EXCLUDED_TYPES):
+        return False
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_SIZE, cache: Optional[CompressedPayloadCache] = None):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.cache = cache if cache is not None else CompressedPayloadCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = _choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        cacheable = scope["method"] == "GET" and scope["path"] in CACHEABLE_PATHS
+        responder = _CompressingResponder(send, encoding, self.minimum_size, self.cache if cacheable else None)
+        await self.app(scope, receive, responder)
+
+
+class _CompressingResponder:
+    def __init__(self, send, encoding: str, minimum_size: int, cache: Optional[CompressedPayloadCache]):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.cache = cache
+        self.start_message = None
+        self.passthrough = False
+        self.encoder: Optional[_Encoder] = None
+
+    async def __call__(self, message):
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = {k.lower(): v for k, v in message.get("headers", [])}
+            content_type = headers.get(b"content-type", b"").decode("latin-1")
+            if b"content-encoding" in headers or not _is_compressible(content_type):
+                self.passthrough = True
+                await self.send(message)
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None and not more_body:
+            # Whole response in one message: the common case for JSON endpoints
+            if len(body) < self.minimum_size or self.start_message["status"] not in (200, 201, 203):
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            if self.cache is not None and self.start_message["status"] == 200:
+                compressed = self.cache.get_or_compress(body, self.encoding)
+            else:
+                compressed = compress(body, self.encoding)
+            await self.send(self._compressed_start(len(compressed)))
+            await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        # Streaming response: compress incrementally, without a Content-Length
+        if self.encoder is None:
+            self.encoder = _Encoder(self.encoding)
+            await self.send(self._compressed_start(None))
+        chunk = self.encoder.compress(body) if body else b""
+        if not more_body:
+            chunk += self.encoder.flush()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+    def _compressed_start(self, content_length: Optional[int]):
+        headers = [
+            (k, v) for k, v in self.start_message.get("headers", [])
+            if k.lower() not in (b"content-length", b"vary")
+        ]
+        vary = [v for k, v in self.start_message.get("headers", []) if k.lower() == b"vary"]
+        headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode("latin-1")))
+        return {**self.start_message, "headers": headers}
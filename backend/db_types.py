@@ -0,0 +1,26 @@
+"""Column types and filters that work on both Postgres and the embedded SQLite backend.
+
+Postgres keeps native ARRAY columns; SQLite stores the same lists as JSON.
+Both are wrapped in MutableList so in-place edits such as
+``user.saved_events.append(id)`` are flushed on commit.
+"""
+from sqlalchemy import ARRAY, JSON, Integer, String, func, select
+from sqlalchemy.ext.mutable import MutableList
+
+from database import engine
+
+
+def StringArray():
+    return MutableList.as_mutable(ARRAY(String).with_variant(JSON(), "sqlite"))
+
+
+def IntegerArray():
+    return MutableList.as_mutable(ARRAY(Integer).with_variant(JSON(), "sqlite"))
+
+
+def array_contains(column, value):
+    """Portable ``column.contains([value])`` for StringArray/IntegerArray columns."""
+    if engine.dialect.name == "postgresql":
+        return column.contains([value])
+    elements = func.json_each(column).table_valued("value")
+    return select(elements.c.value).where(elements.c.value == value).exists()
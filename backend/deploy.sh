@@ -42,7 +42,7 @@ case $choice in
         echo "3. Click 'New +' > 'Web Service'."
         echo "4. Select your repository and configure as follows:"
         echo "   - Build Command: pip install -r requirements.txt"
-        echo "   - Start Command: gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app --bind 0.0.0.0:\$PORT"
+        echo "   - Start Command: gunicorn -c gunicorn.conf.py main:app --bind 0.0.0.0:\$PORT"
         echo "   - Set the environment variables as mentioned in the README.md"
         echo ""
         echo "STEP 2: Update the Frontend .env file"
@@ -66,7 +66,7 @@ case $choice in
         echo "3. Click 'New +' > 'Web Service'."
         echo "4. Select your repository and configure as follows:"
         echo "   - Build Command: pip install -r requirements.txt"
-        echo "   - Start Command: gunicorn -w 4 -k uvicorn.workers.UvicornWorker main:app --bind 0.0.0.0:\$PORT"
+        echo "   - Start Command: gunicorn -c gunicorn.conf.py main:app --bind 0.0.0.0:\$PORT"
         echo "   - Set the environment variables as mentioned in the README.md"
         ;;
     3)
@@ -0,0 +1,290 @@
+"""Append-only engagement log and time-decayed trending scores.
+
+Request handlers call ``log.record(...)``, which only appends to an in-memory
+buffer. A background task flushes the buffer in batches: it inserts the raw
+rows into ``engagement_events`` and folds them into each item's
+``trending_score`` in the same transaction.
+
+The score is an exponentially decayed sum kept in log2 space relative to a
+fixed epoch: an action of weight ``w`` at time ``t`` contributes
+``log2(w) + (t - EPOCH) / HALF_LIFE``. Because every item decays at the same
+rate, comparing stored scores gives the same order as comparing decayed
+scores "now", so nothing has to be rewritten as time passes and
+``ORDER BY trending_score DESC`` can use a plain index.
+
+Likes, registrations and applications are also deduplicated per user: each
+(item, action) keeps a compressed bitmap of user ids in
+``engagement_bitmaps`` and the item's counter is the bitmap's cardinality
+plus the count the item already had when its bitmap was created, so
+repeating an action is a no-op. The bitmap is stored one row per container
+(user ids sharing their high 16 bits), so an action rewrites at most one
+8 KiB container instead of the item's whole bitmap, and a viewer's flags only
+read the container holding their id. Reads keep deserialized containers in a
+small LRU keyed by the row's version.
+
+Counters change far more often than anything else about an item, so cached
+and snapshotted results are not invalidated for them: ``counters()`` reads the
+live values for the items being served, and only results ordered by a
+counter or the trending score are keyed to ``counters_table()``'s version.
+"""
+import asyncio
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+import cache
+import models
+from bitmaps import RoaringBitmap
+from cache import LRUCache
+from database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", "24"))
+FLUSH_SECONDS = float(os.getenv("ENGAGEMENT_FLUSH_SECONDS", "2"))
+BATCH_SIZE = int(os.getenv("ENGAGEMENT_BATCH_SIZE", "500"))
+MAX_BUFFERED = int(os.getenv("ENGAGEMENT_MAX_BUFFERED", "50000"))
+BITMAP_CACHE_ENTRIES = int(os.getenv("ENGAGEMENT_BITMAP_CACHE_ENTRIES", "4096"))
+
+EPOCH = datetime(2025, 1, 1)
+WEIGHTS = {"like": 1.0, "save": 2.0, "register": 3.0, "apply": 3.0}
+
+ITEM_MODELS = {
+    "event": models.TechEvent,
+    "opportunity": models.ResearchOpportunity,
+}
+
+# Per-user actions, the item column counting them and the viewer flag they set
+TRACKED_ACTIONS = {
+    "event": {"like": "likes", "register": "attendees"},
+    "opportunity": {"like": "likes", "apply": "applications"},
+}
+VIEWER_FLAGS = {"like": "is_liked", "register": "is_registered", "apply": "has_applied"}
+
+
+def counters_table(item_type: str) -> str:
+    """Result-cache version name for lists ordered by counters or trending score."""
+    return f"{ITEM_MODELS[item_type].__tablename__}:counters"
+
+
+def counters(db, item_type: str, item_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    """Current counters of the given items (likes, attendees/applications), keyed by id."""
+    item_ids = list(set(item_ids))
+    if not item_ids:
+        return {}
+    model = ITEM_MODELS[item_type]
+    names = list(TRACKED_ACTIONS[item_type].values())
+    rows = db.query(model.id, *(getattr(model, name) for name in names)).filter(model.id.in_(item_ids))
+    return {row[0]: {name: value or 0 for name, value in zip(names, row[1:])} for row in rows}
+
+
+def contribution(action: str, occurred_at: datetime) -> float:
+    hours = (occurred_at - EPOCH).total_seconds() / 3600.0
+    return math.log2(WEIGHTS.get(action, 1.0)) + hours / HALF_LIFE_HOURS
+
+
+def log_add(a: Optional[float], b: float) -> float:
+    """log2(2**a + 2**b) without overflowing."""
+    if a is None:
+        return b
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+
+class EngagementLog:
+    def __init__(self):
+        self._buffer: List[dict] = []
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    def record(self, item_type: str, item_id: int, action: str, user_id: Optional[int] = None):
+        entry = {
+            "item_type": item_type,
+            "item_id": item_id,
+            "action": action,
+            "user_id": user_id,
+            "occurred_at": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._buffer) >= MAX_BUFFERED:
+                self.dropped += 1
+                return
+            self._buffer.append(entry)
+            full = len(self._buffer) >= BATCH_SIZE
+        if full and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _drain(self) -> List[dict]:
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        return batch
+
+    def flush(self):
+        batch = self._drain()
+        if not batch:
+            return 0
+        scores: Dict[Tuple[str, int], float] = {}
+        for entry in batch:
+            key = (entry["item_type"], entry["item_id"])
+            scores[key] = log_add(scores.get(key), contribution(entry["action"], entry["occurred_at"]))
+
+        db = SessionLocal()
+        try:
+            db.execute(insert(models.EngagementEvent), batch)
+            for item_type, model in ITEM_MODELS.items():
+                ids = sorted(item_id for kind, item_id in scores if kind == item_type)
+                if not ids:
+                    continue
+                # Lock rows in id order so concurrent flushes from other workers can't deadlock
+                current = (
+                    db.query(model.id, model.trending_score)
+                    .filter(model.id.in_(ids))
+                    .order_by(model.id)
+                    .with_for_update()
+                    .all()
+                )
+                if current:
+                    db.execute(update(model), [
+                        {"id": item_id, "trending_score": log_add(score or 0.0, scores[(item_type, item_id)])}
+                        for item_id, score in current
+                    ])
+            db.commit()
+            # Trending order changed; lists sorted by it are recomputed
+            for item_type in {kind for kind, _ in scores}:
+                cache.results.bump(counters_table(item_type))
+        except Exception:
+            db.rollback()
+            logger.exception("Dropping %d engagement events after failed flush", len(batch))
+            return 0
+        finally:
+            db.close()
+        return len(batch)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await asyncio.to_thread(self.flush)
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+log = EngagementLog()
+
+
+_bitmap_cache = LRUCache(max_entries=BITMAP_CACHE_ENTRIES, ttl=3600)
+
+
+def _insert_ignore(values: dict):
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    return dialect.insert(models.EngagementBitmap).values(**values).on_conflict_do_nothing()
+
+
+def track(db, item_type: str, item_id: int, action: str, user_id: int, baseline: int = 0) -> Tuple[bool, int]:
+    """Add user_id to the item's bitmap for action and return (added, new counter value).
+
+    Only the row holding user_id's container is read and rewritten. baseline
+    is the item's counter before it had a bitmap (anonymous or
+    pre-deduplication actions); it is stored on the first row created for
+    (item, action). The item row stays locked until the caller commits, so
+    concurrent requests for the same item serialize instead of losing updates
+    or both claiming the baseline.
+    """
+    model = ITEM_MODELS[item_type]
+    bitmap = models.EngagementBitmap
+    scope = (bitmap.item_type == item_type, bitmap.item_id == item_id, bitmap.action == action)
+    container = user_id >> 16
+    db.query(model.id).filter(model.id == item_id).with_for_update().one()
+    others = db.query(bitmap.container, bitmap.baseline + bitmap.cardinality).filter(*scope, bitmap.container != container).all()
+    db.execute(_insert_ignore({
+        "item_type": item_type,
+        "item_id": item_id,
+        "action": action,
+        "container": container,
+        "users": b"",
+        "baseline": 0 if others else baseline or 0,
+        # Versions of a row recreated under a reused item id must not match bitmaps cached for the old one
+        "version": time.time_ns() // 1000,
+    }))
+    row = db.query(bitmap).filter(*scope, bitmap.container == container).one()
+    count = sum(total for _, total in others)
+    users = RoaringBitmap.deserialize(row.users)
+    if not users.add(user_id):
+        return False, count + row.baseline + row.cardinality
+    row.users = users.serialize()
+    row.cardinality = len(users)
+    row.version += 1
+    db.flush()
+    return True, count + row.baseline + row.cardinality
+
+
+def forget(db, item_type: str, item_ids: Iterable[int]):
+    """Drop the bitmaps of deleted items, in the caller's transaction, so reused ids start clean."""
+    db.execute(
+        delete(models.EngagementBitmap)
+        .where(models.EngagementBitmap.item_type == item_type, models.EngagementBitmap.item_id.in_(list(item_ids)))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def viewer_flags(db, item_type: str, item_ids: Iterable[int], user_id: int) -> Dict[str, Set[int]]:
+    """Ids among item_ids that user_id has liked/registered for/applied to, keyed by viewer flag."""
+    actions = TRACKED_ACTIONS[item_type]
+    flags = {VIEWER_FLAGS[action]: set() for action in actions}
+    item_ids = list(set(item_ids))
+    if not item_ids:
+        return flags
+    bitmap = models.EngagementBitmap
+    container = user_id >> 16
+    scope = (
+        bitmap.item_type == item_type,
+        bitmap.item_id.in_(item_ids),
+        bitmap.action.in_(list(actions)),
+        bitmap.container == container,
+    )
+    # Fetch only versions first; blobs are read just for bitmaps that changed since they were cached
+    loaded = {}
+    stale = set()
+    for item_id, action, version in db.query(bitmap.item_id, bitmap.action, bitmap.version).filter(*scope):
+        cached = _bitmap_cache.get(f"{item_type}:{item_id}:{action}:{container}")
+        if cached is not None and cached[0] == version:
+            loaded[(item_id, action)] = cached[1]
+        else:
+            stale.add(item_id)
+    if stale:
+        rows = db.query(bitmap.item_id, bitmap.action, bitmap.version, bitmap.users).filter(
+            bitmap.item_type == item_type,
+            bitmap.item_id.in_(sorted(stale)),
+            bitmap.action.in_(list(actions)),
+            bitmap.container == container,
+        )
+        for item_id, action, version, users in rows:
+            users = RoaringBitmap.deserialize(users)
+            _bitmap_cache.set(f"{item_type}:{item_id}:{action}:{container}", (version, users))
+            loaded[(item_id, action)] = users
+    for (item_id, action), users in loaded.items():
+        if user_id in users:
+            flags[VIEWER_FLAGS[action]].add(item_id)
+    return flags
@@ -0,0 +1,191 @@
+"""Offline geocoding and geohash-based radius search.
+
+Locations are resolved against the bundled ``gazetteer.csv`` (no network
+calls) and stored as latitude/longitude plus a geohash. Radius queries are
+turned into a handful of geohash prefix ranges, which the btree index on the
+``geohash`` column answers, and candidates are then filtered and ordered by
+exact great-circle distance.
+"""
+import csv
+import math
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, case, null, or_
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv")
+DEFAULT_RADIUS_KM = 50.0
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Sorts after every base32 character, so prefix ranges are [p, p + _UPPER)
+_UPPER = "{"
+
+_gazetteer: Optional[Dict[str, Tuple[float, float]]] = None
+
+# Common spellings that aren't gazetteer names, already normalized
+_ALIASES = {
+    "nyc": "new york",
+    "new york city": "new york",
+    "la": "los angeles",
+    "sf": "san francisco",
+    "washington dc": "washington",
+    "dc": "washington",
+}
+
+
+def _normalize(value: str) -> str:
+    return re.sub(r"\s+", " ", re.sub(r"[^\w,\s]", "", value.lower())).strip()
+
+
+def _load_gazetteer() -> Dict[str, Tuple[float, float]]:
+    global _gazetteer
+    if _gazetteer is None:
+        index = {}
+        with open(GAZETTEER_PATH, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                coords = (float(row["lat"]), float(row["lon"]))
+                name = _normalize(row["name"])
+                # Rows are ordered by prominence, so a bare city name keeps its first match
+                for key in (
+                    f"{name}, {_normalize(row['region'])}",
+                    f"{name}, {_normalize(row['country'])}",
+                    name,
+                ):
+                    if key and not key.endswith(", "):
+                        index.setdefault(key, coords)
+        _gazetteer = index
+    return _gazetteer
+
+
+def geocode(location: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not location:
+        return None
+    gazetteer = _load_gazetteer()
+    parts = [p.strip() for p in _normalize(location).split(",") if p.strip()]
+    parts = [_ALIASES.get(part, part) for part in parts]
+    # "MIT, Cambridge, MA" -> every "part, later part" pair first ("cambridge, ma" is the
+    # one that matches), then each part on its own, so venues in front of the city don't hide it
+    candidates = [f"{part}, {qualifier}" for i, part in enumerate(parts) for qualifier in parts[i + 1:]]
+    candidates.extend(parts)
+    for key in candidates:
+        if key in gazetteer:
+            return gazetteer[key]
+    return None
+
+
+def geocode_values(location: Optional[str], virtual: bool) -> dict:
+    coords = None if virtual else geocode(location)
+    if coords is None:
+        return {"latitude": None, "longitude": None, "geohash": None}
+    return {"latitude": coords[0], "longitude": coords[1], "geohash": encode(*coords)}
+
+
+def apply_geocode(item):
+    """Set latitude/longitude/geohash on a TechEvent or ResearchOpportunity from its location."""
+    for key, value in geocode_values(item.location, item.virtual).items():
+        setattr(item, key, value)
+
+
+def patch_geocode_values(model, fields: dict) -> dict:
+    """Coordinate column values for a partial UPDATE touching only ``fields``."""
+    if fields.get("virtual"):
+        return geocode_values(None, True)
+    if "location" not in fields:
+        return {}
+    values = geocode_values(fields["location"], False)
+    if "virtual" in fields:
+        return values
+    # The stored virtual flag decides, still inside the same UPDATE
+    return {key: case((model.virtual.is_(True), null()), else_=value) for key, value in values.items()}
+
+
+def encode(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            rng[0] = mid
+        else:
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def _cell_size_deg(precision: int) -> Tuple[float, float]:
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> List[str]:
+    """Geohash prefixes whose union contains every point within radius_km of (lat, lon)."""
+    radius_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    radius_lon = min(radius_lat / cos_lat, 180.0)
+
+    # Coarsest-to-finest: pick the finest precision whose cells are still at
+    # least as large as the radius, so the 3x3 block around the centre suffices
+    precision = 0
+    for p in range(1, GEOHASH_PRECISION + 1):
+        cell_lat, cell_lon = _cell_size_deg(p)
+        if cell_lat < radius_lat or cell_lon < radius_lon:
+            break
+        precision = p
+    if precision == 0:
+        # Radius is wider than a top-level cell; the empty prefix matches everything
+        return [""]
+
+    cell_lat, cell_lon = _cell_size_deg(precision)
+    cells = set()
+    for dlat in (-cell_lat, 0.0, cell_lat):
+        for dlon in (-cell_lon, 0.0, cell_lon):
+            clat = min(max(lat + dlat, -89.999999), 89.999999)
+            clon = (lon + dlon + 180.0) % 360.0 - 180.0
+            cells.add(encode(clat, clon, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_filter(model, lat: float, lon: float, radius_km: float):
+    """Index-friendly prefilter on model.geohash; callers must still check exact distance."""
+    return or_(*[
+        and_(model.geohash >= cell, model.geohash < cell + _UPPER)
+        for cell in covering_cells(lat, lon, radius_km)
+    ])
+
+
+def within_radius(items, lat: float, lon: float, radius_km: float):
+    """Annotate items with distance_km, drop those outside the radius and sort nearest first.
+
+    Items without coordinates (matched on their location text instead) are kept
+    after the located ones, in their original order, with no distance.
+    """
+    matches, unlocated = [], []
+    for item in items:
+        if item.latitude is None or item.longitude is None:
+            item.distance_km = None
+            unlocated.append(item)
+            continue
+        item.distance_km = round(haversine_km(lat, lon, item.latitude, item.longitude), 2)
+        if item.distance_km <= radius_km:
+            matches.append(item)
+    matches.sort(key=lambda item: item.distance_km)
+    return matches + unlocated
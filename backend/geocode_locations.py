@@ -0,0 +1,39 @@
+from sqlalchemy import text
+from database import engine, SessionLocal
+import geo
+import models
+from migrate_catalog import migrate_catalog
+
+# Adds the coordinate columns to tables created before geocoding existed and
+# backfills them from each row's location string.
+def geocode_locations():
+    # Loading whole rows below needs every column the models declare
+    migrate_catalog()
+    # Fresh databases (and the embedded SQLite backend) get these columns from create_all
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            for table in ("tech_events", "research_opportunities"):
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS latitude DOUBLE PRECISION"))
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS longitude DOUBLE PRECISION"))
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS geohash VARCHAR(12)"))
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_geohash ON {table} (geohash)"))
+
+    db = SessionLocal()
+    try:
+        for model in (models.TechEvent, models.ResearchOpportunity):
+            located = 0
+            items = db.query(model).all()
+            for item in items:
+                geo.apply_geocode(item)
+                if item.geohash:
+                    located += 1
+            db.commit()
+            print(f"{model.__tablename__}: geocoded {located} of {len(items)} rows")
+    except Exception as e:
+        print(f"Error: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    geocode_locations()
@@ -0,0 +1,13 @@
+"""Gunicorn settings used by the Procfile, render.yaml and the Dockerfile."""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+worker_class = "uvicorn.workers.UvicornWorker"
+# Changes only reach other workers through Postgres LISTEN/NOTIFY; SQLite serves from one process
+if os.getenv("DATABASE_URL", "").startswith("sqlite"):
+    workers = 1
+else:
+    workers = int(os.getenv("WEB_CONCURRENCY", "4"))
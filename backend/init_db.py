@@ -1,6 +1,10 @@
 from database import engine
 import models
+from migrate_catalog import migrate_catalog
+from migrate_engagement_bitmaps import migrate_engagement_bitmaps
 
 print("Creating database tables...")
 models.Base.metadata.create_all(bind=engine)
+migrate_catalog()
+migrate_engagement_bitmaps()
 print("Database tables created successfully!") 
\ No newline at end of file
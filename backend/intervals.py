@@ -0,0 +1,31 @@
+"""Sweep for schedule conflicts between saved events.
+
+Intervals are half-open ``[start, end)``: an event ending at 10:00 does not
+conflict with one starting at 10:00. Callers pass intervals with
+``end >= start``; an empty interval (``end == start``) is an instant and
+conflicts with the intervals that strictly contain it. ``overlapping_pairs``
+finds every conflict in a set with one sweep in start order, in
+O(n log n + k) for k conflicts. Checking a single new interval against a set
+is a range predicate the database answers directly (see ``_schedule_conflicts``
+in main.py).
+"""
+import heapq
+from typing import Any, Hashable, Iterable, List, Tuple
+
+Interval = Tuple[Any, Any, Hashable]  # (start, end, key)
+
+
+def overlapping_pairs(intervals: Iterable[Interval]) -> List[Tuple[Hashable, Hashable]]:
+    """Every pair of overlapping intervals, by sweeping them in start order."""
+    pairs = []
+    active: List[Tuple[Any, int, Any, Hashable]] = []  # (end, tiebreak, start, key), soonest end first
+    for order, (start, end, key) in enumerate(sorted(intervals, key=lambda interval: interval[0])):
+        while active and active[0][0] <= start:
+            heapq.heappop(active)
+        for _, _, other_start, other in active:
+            # Only an empty interval sitting exactly on another's start can fail this
+            if other_start < end:
+                pairs.append((other, key))
+        if end > start:
+            heapq.heappush(active, (end, order, start, key))
+    return pairs
@@ -1,20 +1,39 @@
-from fastapi import FastAPI, Depends, HTTPException, Query, status, Form
+from fastapi import FastAPI, Depends, HTTPException, Query, status, Form, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional, Union
+from typing import List, Optional, Tuple, Union
 from datetime import datetime, timedelta
 import models, schemas
 from database import engine, get_db, SessionLocal
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import or_, and_
+from compression import CompressionMiddleware
+from db_types import array_contains
+from sqlalchemy import or_, and_, case, update, delete
 from sqlalchemy.sql import func
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+import asyncio
+import json
 import os
+import time
+import cache
+import engagement
+import geo
+import intervals
+import profiling
+import realtime
+import reminders
+import similarity
+import slow_queries
+import snapshot
+import tasks
 
 models.Base.metadata.create_all(bind=engine)
 
 app = FastAPI(title="Tech Events API")
+# Lets the request profiler find the threadpool thread a sync endpoint runs on
+app.router.route_class = profiling.ProfiledRoute
 
 # Configure CORS
 app.add_middleware(
@@ -24,6 +43,64 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(slow_queries.RequestContextMiddleware)
+
+CATALOG_TABLES = {
+    "event": models.TechEvent.__tablename__,
+    "opportunity": models.ResearchOpportunity.__tablename__,
+}
+
+def _invalidate_on_catalog_change(message: dict):
+    # Writes on other workers reach us through the realtime hub; keep our local cache versions in step
+    if message.get("type") == "counters" and message.get("kind") in CATALOG_TABLES:
+        cache.results.bump(engagement.counters_table(message["kind"]), local_only=True)
+    if message.get("topic") == realtime.CATALOG_TOPIC:
+        table = CATALOG_TABLES.get(message.get("kind"))
+        if table:
+            cache.results.bump(table, local_only=True)
+            similarity.index.mark_dirty(message["kind"], [message["id"]])
+            tasks.queue.enqueue("similarity", _refresh_similarity, message["kind"], key=f"similarity:{message['kind']}")
+
+realtime.hub.add_listener(_invalidate_on_catalog_change)
+
+_STARTED_AT = time.time()
+
+def _build_similarity_index():
+    db = SessionLocal()
+    try:
+        similarity.index.rebuild(db)
+    finally:
+        db.close()
+
+def _refresh_similarity(kind: str):
+    db = SessionLocal()
+    try:
+        similarity.index.refresh(db, kind)
+    finally:
+        db.close()
+
+def _publish_snapshot():
+    # Catalog edits must not be read back stale, so drop the file until the rebuild lands.
+    # Counters are read live on every snapshot lookup and never need a rebuild
+    snapshot.catalog.invalidate()
+    # The timestamp makes sure the build includes this commit
+    tasks.queue.enqueue("snapshot", snapshot.catalog.publish, time.time(), key="snapshot")
+
+@app.on_event("startup")
+async def start_background_services():
+    await tasks.queue.start()
+    await realtime.hub.start()
+    await engagement.log.start()
+    # Once per deployment: the first worker through the lock builds, the rest map its file
+    tasks.queue.enqueue("snapshot", snapshot.catalog.publish, _STARTED_AT, key="snapshot")
+    tasks.queue.enqueue("similarity", _build_similarity_index)
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await realtime.hub.stop()
+    await engagement.log.stop()
+    await tasks.queue.stop()
 
 # Security configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here")  # In production, use environment variable
@@ -32,6 +109,7 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 # Dependency to get database session
 def get_db():
@@ -105,6 +183,114 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         raise credentials_exception
     return user
 
+def get_optional_admin(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)) -> Optional[models.Admin]:
+    # Admins can still open deactivated items, to review or reactivate them
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    if payload.get("user_type") != "admin" or payload.get("sub") is None:
+        return None
+    return db.query(models.Admin).filter(models.Admin.username == payload["sub"]).first()
+
+def get_viewer_state(token: Optional[str] = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):
+    # Anonymous, admin or stale tokens simply get unannotated results
+    if not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    user_id = payload.get("user_id")
+    if payload.get("user_type", "user") != "user" or user_id is None:
+        return None
+    # One primary-key lookup of the id arrays covers every item on the page
+    row = db.query(models.User.saved_events, models.User.saved_opportunities).filter(models.User.id == user_id).first()
+    if row is None:
+        return None
+    return {
+        "user_id": user_id,
+        "event": {"is_saved": set(row.saved_events or [])},
+        "opportunity": {"is_saved": set(row.saved_opportunities or [])},
+    }
+
+def _annotate(db: Session, items: List[dict], kind: str, viewer) -> List[dict]:
+    # Cached result lists are shared, so annotate copies
+    if viewer is None:
+        return items
+    flags = {
+        **viewer[kind],
+        # Like/register/apply membership lives in per-item bitmaps, so it is looked up for this page only
+        **engagement.viewer_flags(db, kind, [item["id"] for item in items], viewer["user_id"]),
+    }
+    return [{**item, **{flag: item["id"] in ids for flag, ids in flags.items()}} for item in items]
+
+def _track_engagement(db: Session, kind: str, item, action: str, current_user) -> Tuple[bool, int]:
+    # Counters are the number of distinct users (on top of what the item had before
+    # per-user tracking), so repeating an action changes nothing
+    if not isinstance(current_user, models.User):
+        raise HTTPException(status_code=403, detail="Only user accounts can do this")
+    column = engagement.TRACKED_ACTIONS[kind][action]
+    added, count = engagement.track(db, kind, item.id, action, current_user.id, baseline=getattr(item, column))
+    if added:
+        setattr(item, column, count)
+        realtime.notify_counters(db, kind, item.id, **{column: count})
+    db.commit()
+    if added:
+        # Only lists ordered by counters go stale; other cached results get live counters on read
+        cache.results.bump(engagement.counters_table(kind))
+        engagement.log.record(kind, item.id, action, current_user.id)
+    return added, count
+
+# List orders that change with every like, registration or application (or trending flush)
+COUNTER_SORTS = {"likes", "attendees", "applications", "trending", "trending_score"}
+
+def _cached_list(db: Session, kind: str, key: str, load, sort_by: Optional[str] = None) -> List[dict]:
+    table = CATALOG_TABLES[kind]
+    if sort_by in COUNTER_SORTS:
+        key = f"{key}#counters={cache.results.version(engagement.counters_table(kind))}"
+    results = cache.results.get_or_compute(table, key, load)
+    # Engagement doesn't invalidate cached results; their counters are patched in from the rows
+    live = engagement.counters(db, kind, [item["id"] for item in results])
+    return [{**item, **live.get(item["id"], {})} for item in results]
+
+def _similar_items(db: Session, kind: str, model, item_id: int, limit: int, viewer) -> List[dict]:
+    ranked = similarity.index.similar(db, kind, item_id, limit)
+    if ranked is None:
+        # Inactive, or nothing to compare on
+        if db.query(model.id).filter(model.id == item_id).first() is None:
+            raise HTTPException(status_code=404, detail=f"{'Event' if kind == 'event' else 'Opportunity'} not found")
+        return []
+    items = {other: json.loads(record) for other, record in snapshot.catalog.many(db, kind, [other for other, _ in ranked]).items()}
+    missing = [other for other, _ in ranked if other not in items]
+    if missing:
+        schema = schemas.TechEvent if kind == "event" else schemas.ResearchOpportunity
+        for row in db.query(model).filter(model.id.in_(missing)):
+            items[row.id] = schema.model_validate(row).model_dump(mode="json")
+    results = [{**items[other], "similarity": score} for other, score in ranked if other in items]
+    return _annotate(db, results, kind, viewer)
+
+def _from_snapshot(db: Session, records: List[bytes], kind: str, viewer):
+    # Anonymous readers get the stored JSON as-is, without decoding or validating it again
+    if viewer is None:
+        return Response(content=b"[" + b",".join(records) + b"]", media_type="application/json")
+    return _annotate(db, [json.loads(record) for record in records], kind, viewer)
+
+async def _is_admin_token(token: str) -> bool:
+    db = SessionLocal()
+    try:
+        await get_current_admin(token=token, db=db)
+        return True
+    except HTTPException:
+        return False
+    finally:
+        db.close()
+
+# Admins can profile a single request with an X-Profile: 1 header or ?profile=1
+app.add_middleware(profiling.ProfilingMiddleware, authenticate=_is_admin_token)
+
 # Authentication endpoints
 @app.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
@@ -239,15 +425,70 @@ def save_event(
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Check if already saved
+    conflicts = []
     if event_id in current_user.saved_events:
         # If already saved, remove it (toggle behavior)
         current_user.saved_events.remove(event_id)
+        saved = False
     else:
         # If not saved, add it
+        conflicts = _schedule_conflicts(db, current_user, event)
         current_user.saved_events.append(event_id)
+        engagement.log.record("event", event_id, "save", user_id=current_user.id)
+        saved = True
     
     db.commit()
-    return {"success": True}
+    return {"success": True, "saved": saved, "conflicts": conflicts}
+
+def _event_interval(start, end, key):
+    # Legacy rows without an end date count as instants, as do rows ending before they start
+    return (start, end if end is not None and end > start else start, key)
+
+# _event_interval's end, in SQL
+_EVENT_END = case(
+    (models.TechEvent.end_date > models.TechEvent.start_date, models.TechEvent.end_date),
+    else_=models.TechEvent.start_date,
+)
+
+def _schedule_conflicts(db: Session, user: models.User, event: models.TechEvent) -> List[dict]:
+    if event.start_date is None or not user.saved_events:
+        return []
+    start, end, _ = _event_interval(event.start_date, event.end_date, event.id)
+    # Same half-open overlap test as intervals.overlapping_pairs, so only the conflicting rows are read
+    rows = (
+        db.query(models.TechEvent.id, models.TechEvent.title, models.TechEvent.start_date, models.TechEvent.end_date)
+        .filter(
+            models.TechEvent.id.in_(user.saved_events),
+            models.TechEvent.id != event.id,
+            models.TechEvent.start_date < end,
+            _EVENT_END > start,
+        )
+        .order_by(models.TechEvent.start_date.asc(), models.TechEvent.id.asc())
+        .all()
+    )
+    return [
+        schemas.EventConflict.model_validate(row, from_attributes=True).model_dump(mode="json")
+        for row in rows
+    ]
+
+@app.get("/users/me/schedule", response_model=List[schemas.ScheduleEntry])
+def get_schedule(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    events = (
+        db.query(models.TechEvent)
+        .filter(models.TechEvent.id.in_(current_user.saved_events))
+        .order_by(models.TechEvent.start_date.asc(), models.TechEvent.id.asc())
+        .all()
+    )
+    conflicts = {event.id: [] for event in events}
+    for a, b in intervals.overlapping_pairs(
+        _event_interval(event.start_date, event.end_date, event.id) for event in events if event.start_date is not None
+    ):
+        conflicts[a].append(b)
+        conflicts[b].append(a)
+    return [{"event": event, "conflicts": sorted(conflicts[event.id])} for event in events]
 
 @app.post("/users/me/save-opportunity/{opportunity_id}")
 def save_opportunity(
@@ -264,9 +505,12 @@ def save_opportunity(
     if opportunity_id in current_user.saved_opportunities:
         # If already saved, remove it (toggle behavior)
         current_user.saved_opportunities.remove(opportunity_id)
+        reminders.cancel(db, current_user.id, [opportunity_id])
     else:
         # If not saved, add it
         current_user.saved_opportunities.append(opportunity_id)
+        reminders.schedule(db, current_user.id, opportunity_id, opportunity.deadline)
+        engagement.log.record("opportunity", opportunity_id, "save", user_id=current_user.id)
     
     db.commit()
     return {"success": True}
@@ -289,37 +533,86 @@ def get_saved_opportunities(
     ).all()
     return opportunities
 
+def _event_dicts(events):
+    return [schemas.TechEvent.model_validate(event).model_dump(mode="json") for event in events]
+
+def _opportunity_dicts(opportunities):
+    return [schemas.ResearchOpportunity.model_validate(opportunity).model_dump(mode="json") for opportunity in opportunities]
+
+def _update_returning(db: Session, model, item_id: int, values: dict):
+    return db.execute(
+        update(model)
+        .where(model.id == item_id)
+        .values(**values)
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
 @app.get("/events/", response_model=List[schemas.TechEvent])
 def get_events(
     skip: int = 0,
     limit: int = 20,
     sort_by: str = "start_date",
     sort_order: str = "asc",
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
 ):
-    query = db.query(models.TechEvent)
+    def load():
+        query = db.query(models.TechEvent).filter(models.TechEvent.is_active.isnot(False))
     
-    # Apply sorting
-    if sort_by == "start_date":
-        query = query.order_by(models.TechEvent.start_date.asc())
-    elif sort_by == "created_at":
-        query = query.order_by(models.TechEvent.created_at.desc())
-    elif sort_by == "likes":
-        query = query.order_by(models.TechEvent.likes.desc())
+        # Apply sorting
+        if sort_by == "start_date":
+            query = query.order_by(models.TechEvent.start_date.asc())
+        elif sort_by == "created_at":
+            query = query.order_by(models.TechEvent.created_at.desc())
+        elif sort_by == "likes":
+            query = query.order_by(models.TechEvent.likes.desc())
+        elif sort_by == "trending":
+            # Precomputed time-decayed score maintained by engagement.py; served straight off its index
+            query = query.order_by(models.TechEvent.trending_score.desc())
+            return _event_dicts(query.offset(skip).limit(limit).all())
     
-    if sort_order == "desc":
-        query = query.order_by(getattr(models.TechEvent, sort_by).desc())
-    else:
-        query = query.order_by(getattr(models.TechEvent, sort_by).asc())
+        if sort_order == "desc":
+            query = query.order_by(getattr(models.TechEvent, sort_by).desc())
+        else:
+            query = query.order_by(getattr(models.TechEvent, sort_by).asc())
+    
+        return _event_dicts(query.offset(skip).limit(limit).all())
     
-    return query.offset(skip).limit(limit).all()
+    if sort_by == "start_date" and sort_order == "asc":
+        records = snapshot.catalog.page(db, "event", skip, limit)
+        if records is not None:
+            return _from_snapshot(db, records, "event", viewer)
+
+    key = cache.make_key("events", skip=skip, limit=limit, sort_by=sort_by, sort_order=sort_order)
+    return _annotate(db, _cached_list(db, "event", key, load, sort_by), "event", viewer)
 
 @app.get("/events/{event_id}", response_model=schemas.TechEvent)
-def get_event(event_id: int, db: Session = Depends(get_db)):
+def get_event(
+    event_id: int,
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state),
+    admin: Optional[models.Admin] = Depends(get_optional_admin)
+):
+    record = snapshot.catalog.get(db, "event", event_id)
+    if record is not None:
+        if viewer is None:
+            return Response(content=record, media_type="application/json")
+        return _annotate(db, [json.loads(record)], "event", viewer)[0]
+    # Not in the snapshot: inactive, or the snapshot is disabled or missing
     event = db.query(models.TechEvent).filter(models.TechEvent.id == event_id).first()
-    if event is None:
+    if event is None or (event.is_active is False and admin is None):
         raise HTTPException(status_code=404, detail="Event not found")
-    return event
+    return _annotate(db, _event_dicts([event]), "event", viewer)[0]
+
+@app.get("/events/{event_id}/similar", response_model=List[schemas.TechEvent])
+def get_similar_events(
+    event_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
+):
+    return _similar_items(db, "event", models.TechEvent, event_id, limit, viewer)
 
 @app.post("/events/", response_model=schemas.TechEvent)
 def create_event(
@@ -328,26 +621,60 @@ def create_event(
     current_admin: models.Admin = Depends(get_current_admin)
 ):
     db_event = models.TechEvent(**event.dict())
+    geo.apply_geocode(db_event)
     db.add(db_event)
+    db.flush()
+    realtime.notify_catalog(db, "event", db_event.id, "created")
     db.commit()
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
     db.refresh(db_event)
     return db_event
 
-@app.get("/events/search/")
+@app.get("/events/search/", response_model=List[schemas.TechEvent])
 def search_events(
     query: Optional[str] = None,
     location: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(geo.DEFAULT_RADIUS_KM, gt=0, le=20000),
     type: Optional[schemas.EventType] = None,
     virtual: Optional[bool] = None,
     start_date_after: Optional[datetime] = None,
     end_date_before: Optional[datetime] = None,
     tech_stack: Optional[List[str]] = Query(None),
     tags: Optional[List[str]] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
+):
+    params = dict(
+        query=query, location=location, lat=lat, lon=lon, radius_km=radius_km, type=type, virtual=virtual,
+        start_date_after=start_date_after, end_date_before=end_date_before, tech_stack=tech_stack, tags=tags
+    )
+    results = _cached_list(
+        db, "event",
+        cache.make_key("events/search", **params),
+        lambda: _event_dicts(_search_events(db, **params))
+    )
+    return _annotate(db, results, "event", viewer)
+
+def _search_events(
+    db: Session,
+    query: Optional[str],
+    location: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+    radius_km: float,
+    type: Optional[schemas.EventType],
+    virtual: Optional[bool],
+    start_date_after: Optional[datetime],
+    end_date_before: Optional[datetime],
+    tech_stack: Optional[List[str]],
+    tags: Optional[List[str]]
 ):
     events = db.query(models.TechEvent)
     
-    filters = []
+    filters = [models.TechEvent.is_active.isnot(False)]
     
     if query:
         filters.append(
@@ -358,8 +685,22 @@ def search_events(
             )
         )
     
-    if location:
-        filters.append(models.TechEvent.location.ilike(f"%{location}%"))
+    # Radius search around explicit coordinates, or around a location we can geocode;
+    # locations missing from the gazetteer, and rows we could not geocode, fall back to substring matching
+    text_match = None
+    if (lat is None or lon is None) and location:
+        text_match = models.TechEvent.location.ilike(f"%{location}%")
+        coords = geo.geocode(location)
+        if coords:
+            lat, lon = coords
+    near = lat is not None and lon is not None
+    if near:
+        nearby = geo.radius_filter(models.TechEvent, lat, lon, radius_km)
+        if text_match is not None:
+            nearby = or_(nearby, and_(models.TechEvent.geohash.is_(None), text_match))
+        filters.append(nearby)
+    elif text_match is not None:
+        filters.append(text_match)
     
     if type:
         filters.append(models.TechEvent.type == type)
@@ -375,27 +716,32 @@ def search_events(
     
     if tech_stack:
         for tech in tech_stack:
-            filters.append(models.TechEvent.tech_stack.contains([tech]))
+            filters.append(array_contains(models.TechEvent.tech_stack, tech))
     
     if tags:
         for tag in tags:
-            filters.append(models.TechEvent.tags.contains([tag]))
+            filters.append(array_contains(models.TechEvent.tags, tag))
     
     if filters:
         events = events.filter(and_(*filters))
     
-    return events.order_by(models.TechEvent.start_date.asc()).all()
+    events = events.order_by(models.TechEvent.start_date.asc()).all()
+    if near:
+        return geo.within_radius(events, lat, lon, radius_km)
+    return events
 
 @app.get("/events/stats/")
 def get_stats(db: Session = Depends(get_db)):
-    total_events = db.query(models.TechEvent).count()
-    total_attendees = db.query(func.sum(models.TechEvent.attendees)).scalar() or 0
-    total_likes = db.query(func.sum(models.TechEvent.likes)).scalar() or 0
+    # Deactivated events are hidden everywhere else, so they are not counted either
+    active = models.TechEvent.is_active.isnot(False)
+    total_events = db.query(models.TechEvent).filter(active).count()
+    total_attendees = db.query(func.sum(models.TechEvent.attendees)).filter(active).scalar() or 0
+    total_likes = db.query(func.sum(models.TechEvent.likes)).filter(active).scalar() or 0
     
-    types = db.query(models.TechEvent.type, func.count()).group_by(models.TechEvent.type).all()
-    virtual_vs_physical = db.query(models.TechEvent.virtual, func.count()).group_by(models.TechEvent.virtual).all()
+    types = db.query(models.TechEvent.type, func.count()).filter(active).group_by(models.TechEvent.type).all()
+    virtual_vs_physical = db.query(models.TechEvent.virtual, func.count()).filter(active).group_by(models.TechEvent.virtual).all()
     
-    upcoming_events = db.query(models.TechEvent).filter(models.TechEvent.start_date >= datetime.now()).count()
+    upcoming_events = db.query(models.TechEvent).filter(active, models.TechEvent.start_date >= datetime.now()).count()
     
     return {
         "total_events": total_events,
@@ -413,16 +759,45 @@ def update_event(
     db: Session = Depends(get_db),
     current_admin: models.Admin = Depends(get_current_admin)
 ):
-    db_event = db.query(models.TechEvent).filter(models.TechEvent.id == event_id).first()
-    if not db_event:
+    values = event.dict()
+    values.update(geo.geocode_values(event.location, event.virtual))
+    db_event = _update_returning(db, models.TechEvent, event_id, values)
+    if db_event is None:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    for key, value in event.dict().items():
-        setattr(db_event, key, value)
+    result = schemas.TechEvent.model_validate(db_event)
+    realtime.notify_catalog(db, "event", event_id, "updated")
+    db.commit()
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
+    return result
+
+@app.patch("/events/{event_id}", response_model=schemas.TechEvent)
+def patch_event(
+    event_id: int,
+    event: schemas.TechEventUpdate,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    # Only the supplied fields are written, in a single UPDATE ... RETURNING
+    values = event.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    values.update(geo.patch_geocode_values(models.TechEvent, values))
+    db_event = _update_returning(db, models.TechEvent, event_id, values)
+    if db_event is None:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if values.get("virtual") is False and "location" not in values:
+        # Coordinates depend on the stored location, which we only know now
+        geo.apply_geocode(db_event)
+        db.flush()
     
+    result = schemas.TechEvent.model_validate(db_event)
+    realtime.notify_catalog(db, "event", event_id, "updated")
     db.commit()
-    db.refresh(db_event)
-    return db_event
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
+    return result
 
 @app.delete("/events/{event_id}")
 def delete_event(
@@ -430,32 +805,86 @@ def delete_event(
     db: Session = Depends(get_db),
     current_admin: models.Admin = Depends(get_current_admin)
 ):
-    db_event = db.query(models.TechEvent).filter(models.TechEvent.id == event_id).first()
-    if not db_event:
+    deleted = db.execute(
+        delete(models.TechEvent).where(models.TechEvent.id == event_id).returning(models.TechEvent.id)
+    ).scalar_one_or_none()
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Event not found")
-    db.delete(db_event)
+    engagement.forget(db, "event", [event_id])
+    realtime.notify_catalog(db, "event", event_id, "deleted")
     db.commit()
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
     return {"message": "Event deleted"}
 
+@app.patch("/admin/events/bulk", response_model=schemas.BulkResult)
+def bulk_update_events(
+    bulk: schemas.TechEventBulkUpdate,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    values = bulk.dict(exclude_unset=True, exclude={"ids"})
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    ids = db.execute(
+        update(models.TechEvent)
+        .where(models.TechEvent.id.in_(bulk.ids))
+        .values(**values)
+        .returning(models.TechEvent.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    realtime.notify_catalog_many(db, "event", ids, "updated")
+    db.commit()
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
+    return {"affected": len(ids), "ids": ids}
+
+@app.post("/admin/events/bulk-delete", response_model=schemas.BulkResult)
+def bulk_delete_events(
+    bulk: schemas.BulkDelete,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    ids = db.execute(
+        delete(models.TechEvent)
+        .where(models.TechEvent.id.in_(bulk.ids))
+        .returning(models.TechEvent.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    engagement.forget(db, "event", ids)
+    realtime.notify_catalog_many(db, "event", ids, "deleted")
+    db.commit()
+    cache.results.bump(models.TechEvent.__tablename__)
+    _publish_snapshot()
+    return {"affected": len(ids), "ids": ids}
+
 @app.post("/events/{event_id}/like")
-def like_event(event_id: int, db: Session = Depends(get_db)):
+def like_event(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     event = db.query(models.TechEvent).filter(models.TechEvent.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    event.likes += 1
-    db.commit()
-    return {"message": "Event liked successfully", "likes": event.likes}
+    added, likes = _track_engagement(db, "event", event, "like", current_user)
+    message = "Event liked successfully" if added else "Event already liked"
+    return {"message": message, "likes": likes}
 
 @app.post("/events/{event_id}/register")
-def register_for_event(event_id: int, db: Session = Depends(get_db)):
+def register_for_event(
+    event_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     event = db.query(models.TechEvent).filter(models.TechEvent.id == event_id).first()
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    event.attendees += 1
-    db.commit()
-    return {"message": "Successfully registered for event", "attendees": event.attendees}
+    added, attendees = _track_engagement(db, "event", event, "register", current_user)
+    message = "Successfully registered for event" if added else "Already registered for event"
+    return {"message": message, "attendees": attendees}
 
 @app.get("/opportunities/", response_model=List[schemas.ResearchOpportunity])
 def get_opportunities(
@@ -463,31 +892,65 @@ def get_opportunities(
     limit: int = 20,
     sort_by: str = "deadline",
     sort_order: str = "asc",
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
 ):
-    query = db.query(models.ResearchOpportunity)
+    def load():
+        query = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.is_active.isnot(False))
     
-    # Apply sorting
-    if sort_by == "deadline":
-        query = query.order_by(models.ResearchOpportunity.deadline.asc())
-    elif sort_by == "created_at":
-        query = query.order_by(models.ResearchOpportunity.created_at.desc())
-    elif sort_by == "likes":
-        query = query.order_by(models.ResearchOpportunity.likes.desc())
+        # Apply sorting
+        if sort_by == "deadline":
+            query = query.order_by(models.ResearchOpportunity.deadline.asc())
+        elif sort_by == "created_at":
+            query = query.order_by(models.ResearchOpportunity.created_at.desc())
+        elif sort_by == "likes":
+            query = query.order_by(models.ResearchOpportunity.likes.desc())
+        elif sort_by == "trending":
+            # Precomputed time-decayed score maintained by engagement.py; served straight off its index
+            query = query.order_by(models.ResearchOpportunity.trending_score.desc())
+            return _opportunity_dicts(query.offset(skip).limit(limit).all())
     
-    if sort_order == "desc":
-        query = query.order_by(getattr(models.ResearchOpportunity, sort_by).desc())
-    else:
-        query = query.order_by(getattr(models.ResearchOpportunity, sort_by).asc())
+        if sort_order == "desc":
+            query = query.order_by(getattr(models.ResearchOpportunity, sort_by).desc())
+        else:
+            query = query.order_by(getattr(models.ResearchOpportunity, sort_by).asc())
     
-    return query.offset(skip).limit(limit).all()
+        return _opportunity_dicts(query.offset(skip).limit(limit).all())
+    
+    if sort_by == "deadline" and sort_order == "asc":
+        records = snapshot.catalog.page(db, "opportunity", skip, limit)
+        if records is not None:
+            return _from_snapshot(db, records, "opportunity", viewer)
+
+    key = cache.make_key("opportunities", skip=skip, limit=limit, sort_by=sort_by, sort_order=sort_order)
+    return _annotate(db, _cached_list(db, "opportunity", key, load, sort_by), "opportunity", viewer)
 
 @app.get("/opportunities/{opportunity_id}", response_model=schemas.ResearchOpportunity)
-def get_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
+def get_opportunity(
+    opportunity_id: int,
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state),
+    admin: Optional[models.Admin] = Depends(get_optional_admin)
+):
+    record = snapshot.catalog.get(db, "opportunity", opportunity_id)
+    if record is not None:
+        if viewer is None:
+            return Response(content=record, media_type="application/json")
+        return _annotate(db, [json.loads(record)], "opportunity", viewer)[0]
+    # Not in the snapshot: inactive, or the snapshot is disabled or missing
     opportunity = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.id == opportunity_id).first()
-    if opportunity is None:
+    if opportunity is None or (opportunity.is_active is False and admin is None):
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    return opportunity
+    return _annotate(db, _opportunity_dicts([opportunity]), "opportunity", viewer)[0]
+
+@app.get("/opportunities/{opportunity_id}/similar", response_model=List[schemas.ResearchOpportunity])
+def get_similar_opportunities(
+    opportunity_id: int,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
+):
+    return _similar_items(db, "opportunity", models.ResearchOpportunity, opportunity_id, limit, viewer)
 
 @app.post("/opportunities/", response_model=schemas.ResearchOpportunity)
 def create_opportunity(
@@ -496,25 +959,58 @@ def create_opportunity(
     current_admin: models.Admin = Depends(get_current_admin)
 ):
     db_opportunity = models.ResearchOpportunity(**opportunity.dict())
+    geo.apply_geocode(db_opportunity)
     db.add(db_opportunity)
+    db.flush()
+    realtime.notify_catalog(db, "opportunity", db_opportunity.id, "created")
     db.commit()
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
     db.refresh(db_opportunity)
     return db_opportunity
 
-@app.get("/opportunities/search/")
+@app.get("/opportunities/search/", response_model=List[schemas.ResearchOpportunity])
 def search_opportunities(
     query: Optional[str] = None,
     location: Optional[str] = None,
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: float = Query(geo.DEFAULT_RADIUS_KM, gt=0, le=20000),
     type: Optional[schemas.OpportunityType] = None,
     virtual: Optional[bool] = None,
     deadline_after: Optional[datetime] = None,
     fields: Optional[List[str]] = Query(None),
     tags: Optional[List[str]] = Query(None),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    viewer = Depends(get_viewer_state)
+):
+    params = dict(
+        query=query, location=location, lat=lat, lon=lon, radius_km=radius_km, type=type, virtual=virtual,
+        deadline_after=deadline_after, fields=fields, tags=tags
+    )
+    results = _cached_list(
+        db, "opportunity",
+        cache.make_key("opportunities/search", **params),
+        lambda: _opportunity_dicts(_search_opportunities(db, **params))
+    )
+    return _annotate(db, results, "opportunity", viewer)
+
+def _search_opportunities(
+    db: Session,
+    query: Optional[str],
+    location: Optional[str],
+    lat: Optional[float],
+    lon: Optional[float],
+    radius_km: float,
+    type: Optional[schemas.OpportunityType],
+    virtual: Optional[bool],
+    deadline_after: Optional[datetime],
+    fields: Optional[List[str]],
+    tags: Optional[List[str]]
 ):
     opportunities = db.query(models.ResearchOpportunity)
     
-    filters = []
+    filters = [models.ResearchOpportunity.is_active.isnot(False)]
     
     if query:
         filters.append(
@@ -525,8 +1021,20 @@ def search_opportunities(
             )
         )
     
-    if location:
-        filters.append(models.ResearchOpportunity.location.ilike(f"%{location}%"))
+    text_match = None
+    if (lat is None or lon is None) and location:
+        text_match = models.ResearchOpportunity.location.ilike(f"%{location}%")
+        coords = geo.geocode(location)
+        if coords:
+            lat, lon = coords
+    near = lat is not None and lon is not None
+    if near:
+        nearby = geo.radius_filter(models.ResearchOpportunity, lat, lon, radius_km)
+        if text_match is not None:
+            nearby = or_(nearby, and_(models.ResearchOpportunity.geohash.is_(None), text_match))
+        filters.append(nearby)
+    elif text_match is not None:
+        filters.append(text_match)
     
     if type:
         filters.append(models.ResearchOpportunity.type == type)
@@ -539,27 +1047,32 @@ def search_opportunities(
     
     if fields:
         for field in fields:
-            filters.append(models.ResearchOpportunity.fields.contains([field]))
+            filters.append(array_contains(models.ResearchOpportunity.fields, field))
     
     if tags:
         for tag in tags:
-            filters.append(models.ResearchOpportunity.tags.contains([tag]))
+            filters.append(array_contains(models.ResearchOpportunity.tags, tag))
     
     if filters:
         opportunities = opportunities.filter(and_(*filters))
     
-    return opportunities.order_by(models.ResearchOpportunity.deadline.asc()).all()
+    opportunities = opportunities.order_by(models.ResearchOpportunity.deadline.asc()).all()
+    if near:
+        return geo.within_radius(opportunities, lat, lon, radius_km)
+    return opportunities
 
 @app.get("/opportunities/stats/")
 def get_opportunity_stats(db: Session = Depends(get_db)):
-    total_opportunities = db.query(models.ResearchOpportunity).count()
-    total_applications = db.query(func.sum(models.ResearchOpportunity.applications)).scalar() or 0
-    total_likes = db.query(func.sum(models.ResearchOpportunity.likes)).scalar() or 0
+    # Deactivated opportunities are hidden everywhere else, so they are not counted either
+    active = models.ResearchOpportunity.is_active.isnot(False)
+    total_opportunities = db.query(models.ResearchOpportunity).filter(active).count()
+    total_applications = db.query(func.sum(models.ResearchOpportunity.applications)).filter(active).scalar() or 0
+    total_likes = db.query(func.sum(models.ResearchOpportunity.likes)).filter(active).scalar() or 0
     
-    types = db.query(models.ResearchOpportunity.type, func.count()).group_by(models.ResearchOpportunity.type).all()
-    virtual_vs_physical = db.query(models.ResearchOpportunity.virtual, func.count()).group_by(models.ResearchOpportunity.virtual).all()
+    types = db.query(models.ResearchOpportunity.type, func.count()).filter(active).group_by(models.ResearchOpportunity.type).all()
+    virtual_vs_physical = db.query(models.ResearchOpportunity.virtual, func.count()).filter(active).group_by(models.ResearchOpportunity.virtual).all()
     
-    upcoming_opportunities = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.deadline >= datetime.now()).count()
+    upcoming_opportunities = db.query(models.ResearchOpportunity).filter(active, models.ResearchOpportunity.deadline >= datetime.now()).count()
     
     return {
         "total_opportunities": total_opportunities,
@@ -577,16 +1090,48 @@ def update_opportunity(
     db: Session = Depends(get_db),
     current_admin: models.Admin = Depends(get_current_admin)
 ):
-    db_opportunity = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.id == opportunity_id).first()
-    if not db_opportunity:
+    values = opportunity.dict()
+    values.update(geo.geocode_values(opportunity.location, opportunity.virtual))
+    db_opportunity = _update_returning(db, models.ResearchOpportunity, opportunity_id, values)
+    if db_opportunity is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
+    reminders.reschedule(db, opportunity_id, db_opportunity.deadline)
     
-    for key, value in opportunity.dict().items():
-        setattr(db_opportunity, key, value)
+    result = schemas.ResearchOpportunity.model_validate(db_opportunity)
+    realtime.notify_catalog(db, "opportunity", opportunity_id, "updated")
+    db.commit()
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
+    return result
+
+@app.patch("/opportunities/{opportunity_id}", response_model=schemas.ResearchOpportunity)
+def patch_opportunity(
+    opportunity_id: int,
+    opportunity: schemas.ResearchOpportunityUpdate,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    # Only the supplied fields are written, in a single UPDATE ... RETURNING
+    values = opportunity.dict(exclude_unset=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    values.update(geo.patch_geocode_values(models.ResearchOpportunity, values))
+    db_opportunity = _update_returning(db, models.ResearchOpportunity, opportunity_id, values)
+    if db_opportunity is None:
+        raise HTTPException(status_code=404, detail="Opportunity not found")
+    if values.get("virtual") is False and "location" not in values:
+        # Coordinates depend on the stored location, which we only know now
+        geo.apply_geocode(db_opportunity)
+        db.flush()
+    if "deadline" in values:
+        reminders.reschedule(db, opportunity_id, db_opportunity.deadline)
     
+    result = schemas.ResearchOpportunity.model_validate(db_opportunity)
+    realtime.notify_catalog(db, "opportunity", opportunity_id, "updated")
     db.commit()
-    db.refresh(db_opportunity)
-    return db_opportunity
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
+    return result
 
 @app.delete("/opportunities/{opportunity_id}")
 def delete_opportunity(
@@ -594,27 +1139,198 @@ def delete_opportunity(
     db: Session = Depends(get_db),
     current_admin: models.Admin = Depends(get_current_admin)
 ):
-    db_opportunity = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.id == opportunity_id).first()
-    if not db_opportunity:
+    deleted = db.execute(
+        delete(models.ResearchOpportunity).where(models.ResearchOpportunity.id == opportunity_id).returning(models.ResearchOpportunity.id)
+    ).scalar_one_or_none()
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    db.delete(db_opportunity)
+    reminders.cancel_opportunities(db, [opportunity_id])
+    engagement.forget(db, "opportunity", [opportunity_id])
+    realtime.notify_catalog(db, "opportunity", opportunity_id, "deleted")
     db.commit()
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
     return {"message": "Opportunity deleted"}
 
+@app.patch("/admin/opportunities/bulk", response_model=schemas.BulkResult)
+def bulk_update_opportunities(
+    bulk: schemas.ResearchOpportunityBulkUpdate,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    values = bulk.dict(exclude_unset=True, exclude={"ids"})
+    if not values:
+        raise HTTPException(status_code=400, detail="No fields to update")
+    ids = db.execute(
+        update(models.ResearchOpportunity)
+        .where(models.ResearchOpportunity.id.in_(bulk.ids))
+        .values(**values)
+        .returning(models.ResearchOpportunity.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    realtime.notify_catalog_many(db, "opportunity", ids, "updated")
+    db.commit()
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
+    return {"affected": len(ids), "ids": ids}
+
+@app.post("/admin/opportunities/bulk-delete", response_model=schemas.BulkResult)
+def bulk_delete_opportunities(
+    bulk: schemas.BulkDelete,
+    db: Session = Depends(get_db),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    ids = db.execute(
+        delete(models.ResearchOpportunity)
+        .where(models.ResearchOpportunity.id.in_(bulk.ids))
+        .returning(models.ResearchOpportunity.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    reminders.cancel_opportunities(db, ids)
+    engagement.forget(db, "opportunity", ids)
+    realtime.notify_catalog_many(db, "opportunity", ids, "deleted")
+    db.commit()
+    cache.results.bump(models.ResearchOpportunity.__tablename__)
+    _publish_snapshot()
+    return {"affected": len(ids), "ids": ids}
+
 @app.post("/opportunities/{opportunity_id}/like")
-def like_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
+def like_opportunity(
+    opportunity_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     db_opportunity = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.id == opportunity_id).first()
     if not db_opportunity:
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    db_opportunity.likes += 1
-    db.commit()
-    return {"message": "Like recorded"}
+    added, likes = _track_engagement(db, "opportunity", db_opportunity, "like", current_user)
+    return {"message": "Like recorded" if added else "Already liked", "likes": likes}
 
 @app.post("/opportunities/{opportunity_id}/apply")
-def apply_for_opportunity(opportunity_id: int, db: Session = Depends(get_db)):
+def apply_for_opportunity(
+    opportunity_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
     db_opportunity = db.query(models.ResearchOpportunity).filter(models.ResearchOpportunity.id == opportunity_id).first()
     if not db_opportunity:
         raise HTTPException(status_code=404, detail="Opportunity not found")
-    db_opportunity.applications += 1
-    db.commit()
-    return {"message": "Application recorded"}
+    added, applications = _track_engagement(db, "opportunity", db_opportunity, "apply", current_user)
+    return {"message": "Application recorded" if added else "Already applied", "applications": applications}
+
+
+# Live updates
+@app.get("/stream")
+async def stream_updates(
+    request: Request,
+    events: Optional[List[int]] = Query(None),
+    opportunities: Optional[List[int]] = Query(None),
+    catalog: bool = False
+):
+    topics = realtime.topics_for(events, opportunities, catalog)
+    if not topics:
+        raise HTTPException(status_code=400, detail="Subscribe to at least one event, opportunity or the catalog")
+
+    async def event_source():
+        subscriber = realtime.hub.subscribe(topics)
+        try:
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), timeout=realtime.KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {payload}\n\n"
+        finally:
+            realtime.hub.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.websocket("/ws")
+async def websocket_updates(websocket: WebSocket):
+    # Clients send {"action": "subscribe" | "unsubscribe", "events": [...], "opportunities": [...], "catalog": bool}
+    await websocket.accept()
+    subscriber = realtime.hub.subscribe()
+
+    async def sender():
+        while True:
+            await websocket.send_text(await subscriber.queue.get())
+
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+                topics = realtime.topics_for(
+                    [int(i) for i in message.get("events") or []],
+                    [int(i) for i in message.get("opportunities") or []],
+                    bool(message.get("catalog")),
+                )
+            except (ValueError, TypeError, AttributeError):
+                await websocket.send_text(json.dumps({"type": "error", "detail": "Invalid subscription message"}))
+                continue
+            if message.get("action") == "unsubscribe":
+                realtime.hub.remove_topics(subscriber, topics)
+            else:
+                realtime.hub.add_topics(subscriber, topics)
+            await websocket.send_text(json.dumps({"type": "subscribed", "topics": sorted(subscriber.topics)}))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        send_task.cancel()
+        realtime.hub.unsubscribe(subscriber)
+
+# Request profiles
+@app.get("/admin/profiles")
+def list_profiles(current_admin: models.Admin = Depends(get_current_admin)):
+    return profiling.list_profiles()
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, current_admin: models.Admin = Depends(get_current_admin)):
+    if not profiling.PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(profiling.summary_path(profile_id)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    with open(profiling.summary_path(profile_id)) as f:
+        return json.load(f)
+
+@app.get("/admin/profiles/{profile_id}/flamegraph")
+def download_profile(profile_id: str, current_admin: models.Admin = Depends(get_current_admin)):
+    if not profiling.PROFILE_ID_PATTERN.match(profile_id) or not os.path.exists(profiling.folded_path(profile_id)):
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(
+        profiling.folded_path(profile_id),
+        media_type="text/plain",
+        filename=f"profile-{profile_id}.folded",
+    )
+
+# Slow queries
+@app.get("/admin/slow-queries")
+def get_slow_queries(
+    endpoint: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=slow_queries.BUFFER_SIZE),
+    current_admin: models.Admin = Depends(get_current_admin)
+):
+    return {
+        "threshold_ms": slow_queries.SLOW_QUERY_MS,
+        "explain_rate": slow_queries.EXPLAIN_RATE,
+        "summary": slow_queries.summary(),
+        "entries": slow_queries.entries(endpoint=endpoint, limit=limit),
+    }
+
+@app.delete("/admin/slow-queries")
+def clear_slow_queries(current_admin: models.Admin = Depends(get_current_admin)):
+    slow_queries.clear()
+    return {"message": "Slow query buffer cleared"}
+
+# Background tasks
+@app.get("/admin/tasks")
+def get_task_metrics(current_admin: models.Admin = Depends(get_current_admin)):
+    return {
+        "queue": tasks.queue.metrics(),
+        "snapshot": snapshot.catalog.stats(),
+    }
@@ -0,0 +1,31 @@
+from sqlalchemy import inspect, text
+from database import engine
+
+# Columns added to tech_events and research_opportunities after their tables
+# were first created. create_all never alters an existing table, so databases
+# from before these columns existed fail every catalog query until this runs.
+# Each entry is (column, DDL type and default, indexed).
+COLUMNS = (
+    ("trending_score", "FLOAT DEFAULT 0", True),
+    # Existing rows stay visible
+    ("is_active", "BOOLEAN DEFAULT TRUE", True),
+)
+
+TABLES = ("tech_events", "research_opportunities")
+
+def migrate_catalog(bind=engine):
+    for table in TABLES:
+        if not inspect(bind).has_table(table):
+            print(f"{table} does not exist yet; create_all will create it")
+            continue
+        columns = {column["name"] for column in inspect(bind).get_columns(table)}
+        with bind.begin() as conn:
+            for name, ddl, indexed in COLUMNS:
+                if name not in columns:
+                    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    print(f"{table}: added {name}")
+                if indexed:
+                    conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{name} ON {table} ({name})"))
+
+if __name__ == "__main__":
+    migrate_catalog()
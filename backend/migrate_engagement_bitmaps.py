@@ -0,0 +1,61 @@
+from sqlalchemy import inspect, insert, text
+from database import engine
+from bitmaps import RoaringBitmap
+import models
+
+# Brings engagement_bitmaps tables created before counters kept their pre-bitmap
+# baseline up to date. Fresh databases get the new schema from create_all; the
+# baseline itself is filled in from the item's counter when its bitmap is created.
+# Tables from before bitmaps were stored per container are rebuilt with one row
+# per (item, action, container); the baseline moves to the lowest container.
+def migrate_engagement_bitmaps():
+    if not inspect(engine).has_table("engagement_bitmaps"):
+        print("engagement_bitmaps does not exist yet; create_all will create it")
+        return
+    columns = {column["name"] for column in inspect(engine).get_columns("engagement_bitmaps")}
+    with engine.begin() as conn:
+        if "baseline" not in columns:
+            conn.execute(text("ALTER TABLE engagement_bitmaps ADD COLUMN baseline INTEGER NOT NULL DEFAULT 0"))
+            print("engagement_bitmaps: added baseline")
+        if engine.dialect.name == "postgresql":
+            # Versions are seeded from the clock, which no longer fits in 32 bits
+            conn.execute(text("ALTER TABLE engagement_bitmaps ALTER COLUMN version TYPE BIGINT"))
+            print("engagement_bitmaps: version is BIGINT")
+    if "container" not in columns:
+        split_containers()
+
+def split_containers():
+    table = models.EngagementBitmap.__table__
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE engagement_bitmaps RENAME TO engagement_bitmaps_whole"))
+        if engine.dialect.name == "postgresql":
+            # The primary key keeps its name through the rename and would clash with the new table's
+            conn.execute(text("ALTER TABLE engagement_bitmaps_whole RENAME CONSTRAINT engagement_bitmaps_pkey TO engagement_bitmaps_whole_pkey"))
+        table.create(conn)
+        items = rows = 0
+        old = conn.execution_options(yield_per=1000).execute(text(
+            "SELECT item_type, item_id, action, users, baseline, version, updated_at FROM engagement_bitmaps_whole"
+        ))
+        for item_type, item_id, action, users, baseline, version, updated_at in old:
+            parts = sorted(RoaringBitmap.deserialize(users).containers().items()) or [(0, RoaringBitmap())]
+            conn.execute(insert(table), [
+                {
+                    "item_type": item_type,
+                    "item_id": item_id,
+                    "action": action,
+                    "container": container,
+                    "users": part.serialize(),
+                    "cardinality": len(part),
+                    "baseline": (baseline or 0) if i == 0 else 0,
+                    "version": version,
+                    "updated_at": updated_at,
+                }
+                for i, (container, part) in enumerate(parts)
+            ])
+            items += 1
+            rows += len(parts)
+        conn.execute(text("DROP TABLE engagement_bitmaps_whole"))
+    print(f"engagement_bitmaps: split {items} bitmaps into {rows} container rows")
+
+if __name__ == "__main__":
+    migrate_engagement_bitmaps()
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, ARRAY, func, ForeignKey
-from sqlalchemy.sql import func
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, Boolean, Float, LargeBinary, func, ForeignKey
+from sqlalchemy.sql import func, expression
 from database import Base
+from db_types import StringArray, IntegerArray
 from schemas import EventType, OpportunityType
 
 class Admin(Base):
@@ -22,9 +23,9 @@ class User(Base):
     bio = Column(Text, nullable=True)
     profile_image = Column(String, nullable=True)
     is_active = Column(Boolean, default=True)
-    interests = Column(ARRAY(String), default=[])
-    saved_events = Column(ARRAY(Integer), default=[])
-    saved_opportunities = Column(ARRAY(Integer), default=[])
+    interests = Column(StringArray(), default=[])
+    saved_events = Column(IntegerArray(), default=[])
+    saved_opportunities = Column(IntegerArray(), default=[])
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -40,14 +41,19 @@ class TechEvent(Base):
     start_date = Column(DateTime)
     end_date = Column(DateTime)
     location = Column(String)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), index=True, nullable=True)
     type = Column(String)  
     price = Column(String, nullable=True)
-    tech_stack = Column(ARRAY(String), default=[])
-    speakers = Column(ARRAY(String), default=[])
+    tech_stack = Column(StringArray(), default=[])
+    speakers = Column(StringArray(), default=[])
     virtual = Column(Boolean, default=False)
-    tags = Column(ARRAY(String), default=[])
+    tags = Column(StringArray(), default=[])
     attendees = Column(Integer, default=0)
     likes = Column(Integer, default=0)
+    trending_score = Column(Float, default=0.0, index=True)
+    is_active = Column(Boolean, default=True, server_default=expression.true(), index=True)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
@@ -60,15 +66,80 @@ class ResearchOpportunity(Base):
     description = Column(Text)
     type = Column(String)
     location = Column(String)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), index=True, nullable=True)
     deadline = Column(DateTime)
     duration = Column(String, nullable=True)
     compensation = Column(String, nullable=True)
-    requirements = Column(ARRAY(String), default=[])
-    fields = Column(ARRAY(String), default=[])
+    requirements = Column(StringArray(), default=[])
+    fields = Column(StringArray(), default=[])
     contact_email = Column(String)
     virtual = Column(Boolean, default=False)
-    tags = Column(ARRAY(String), default=[])
+    tags = Column(StringArray(), default=[])
     applications = Column(Integer, default=0)
     likes = Column(Integer, default=0)
+    trending_score = Column(Float, default=0.0, index=True)
+    is_active = Column(Boolean, default=True, server_default=expression.true(), index=True)
     created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class EngagementEvent(Base):
+    __tablename__ = "engagement_events"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_type = Column(String, index=True)  # "event" or "opportunity"
+    item_id = Column(Integer, index=True)
+    action = Column(String)  # like, register, apply, save
+    user_id = Column(Integer, nullable=True)
+    occurred_at = Column(DateTime, index=True)
+
+class EngagementBitmap(Base):
+    __tablename__ = "engagement_bitmaps"
+
+    # Compressed sets of user ids per (item, action), one row per bitmaps.py container
+    # so an action only rewrites the 65536-id range its user falls in
+    item_type = Column(String, primary_key=True)  # "event" or "opportunity"
+    item_id = Column(Integer, primary_key=True)
+    action = Column(String, primary_key=True)  # like, register, apply
+    container = Column(Integer, primary_key=True, default=0)  # user_id >> 16
+    users = Column(LargeBinary, nullable=False, default=b"")
+    cardinality = Column(Integer, nullable=False, default=0)
+    baseline = Column(Integer, nullable=False, default=0, server_default="0")  # counted before per-user tracking, on the first row only
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class Outbox(Base):
+    __tablename__ = "outbox"
+
+    # Messages produced by offline jobs, picked up by whatever delivers email or notifications
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, index=True)
+    kind = Column(String, index=True)  # digest, reminder
+    subject = Column(String)
+    payload = Column(Text)  # JSON
+    created_at = Column(DateTime, server_default=func.now())
+    sent_at = Column(DateTime, nullable=True, index=True)
+
+class Reminder(Base):
+    __tablename__ = "reminders"
+
+    # One deadline reminder per saved opportunity; see reminders.py
+    user_id = Column(Integer, primary_key=True)
+    opportunity_id = Column(Integer, primary_key=True, index=True)
+    due_at = Column(DateTime, nullable=True, index=True)  # deadline minus the lead time
+    sent_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), index=True)
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String, primary_key=True)
+    seen_through = Column(DateTime, nullable=True)  # newest item created_at covered by finished runs
+    seen_ids = Column(IntegerArray(), default=[])  # items already processed that are still inside the overlap
+    pending_through = Column(DateTime, nullable=True)  # seen_through once the unfinished run completes
+    pending_ids = Column(IntegerArray(), nullable=True)  # items of an unfinished run
+    cursor = Column(Integer, nullable=True)  # last user id done within that run
+    owner = Column(String, nullable=True)  # run currently holding the job
+    heartbeat_at = Column(DateTime, nullable=True)  # owner's last progress
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,263 @@
+"""On-demand sampling profiler for single requests.
+
+An admin adds ``X-Profile: 1`` (or ``?profile=1``) to a request. While that
+request runs, a sampler thread snapshots the Python stacks of the threads
+working on it every ``PROFILE_INTERVAL_MS``, and the SQL hooks record every
+statement the request issues. Those threads are the event loop thread that
+received the request and, while a sync endpoint runs, the threadpool thread
+it runs on: ``ProfiledRoute`` wraps sync endpoints so they add their thread
+to the active profile, found through the same context variable the SQL hooks
+use. Other requests' threads are never sampled. The samples are written in collapsed-stack format
+(``frame;frame;frame count``), which flamegraph.pl, speedscope and inferno
+read directly, next to a JSON summary with the captured SQL.
+
+Requests without the flag only pay for a header lookup and, in sync
+endpoints, a context variable lookup: the sampler and the SQL hooks are never
+touched.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Set
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from database import engine
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "2"))
+MAX_STACK_DEPTH = 128
+MAX_SQL_STATEMENTS = 1000
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# A thread whose innermost frame is one of these is waiting, not working
+_IDLE_FUNCTIONS = {
+    "wait", "select", "poll", "epoll", "_worker", "sleep", "accept",
+    "_recv_into", "recv", "run_forever", "_run_once", "_wait_for_tstate_lock",
+}
+
+_active = contextvars.ContextVar("active_profile", default=None)
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        # Threads working on this request; only these are sampled
+        self.threads: Set[int] = set()
+        self.sql: List[dict] = []
+        self.status: Optional[int] = None
+        self.duration_ms: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._sample, name=f"profiler-{self.id[:8]}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _sample(self):
+        interval = PROFILE_INTERVAL_MS / 1000.0
+        names = {}
+        while not self._stop.wait(interval):
+            frames = sys._current_frames()
+            for thread_id in list(self.threads):
+                frame = frames.get(thread_id)
+                if frame is None or frame.f_code.co_name in _IDLE_FUNCTIONS:
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def record_sql(self, statement: str, parameters, duration_ms: float, rowcount: int):
+        if len(self.sql) < MAX_SQL_STATEMENTS:
+            self.sql.append({
+                "statement": statement,
+                "parameters": repr(parameters)[:500],
+                "duration_ms": round(duration_ms, 3),
+                "rowcount": rowcount,
+            })
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at.isoformat(),
+            "status": self.status,
+            "duration_ms": self.duration_ms,
+            "samples": self.samples,
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "sql_count": len(self.sql),
+            "sql_time_ms": round(sum(s["duration_ms"] for s in self.sql), 3),
+            "sql": self.sql,
+        }
+
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(folded_path(self.id), "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(summary_path(self.id), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def folded_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+
+
+def summary_path(profile_id: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.json")
+
+
+def list_profiles() -> List[dict]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith(".json"):
+            with open(os.path.join(PROFILE_DIR, name)) as f:
+                summary = json.load(f)
+            summary.pop("sql", None)
+            profiles.append(summary)
+    return sorted(profiles, key=lambda p: p["started_at"], reverse=True)
+
+
+def _install_sql_hooks():
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+
+        @event.listens_for(engine, "before_cursor_execute")
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            if _active.get() is not None:
+                conn.info.setdefault("profile_start", []).append(time.perf_counter())
+
+        @event.listens_for(engine, "after_cursor_execute")
+        def _after(conn, cursor, statement, parameters, context, executemany):
+            profile = _active.get()
+            starts = conn.info.get("profile_start")
+            if profile is not None and starts:
+                duration_ms = (time.perf_counter() - starts.pop()) * 1000
+                profile.record_sql(statement, parameters, duration_ms, cursor.rowcount)
+
+        _hooks_installed = True
+
+
+def track_thread(endpoint: Callable) -> Callable:
+    """Have the active profile, if any, sample the thread a sync endpoint runs on while it runs."""
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        profile = _active.get()
+        if profile is None:
+            return endpoint(*args, **kwargs)
+        thread_id = threading.get_ident()
+        profile.threads.add(thread_id)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            # The pool thread goes on to serve other requests
+            profile.threads.discard(thread_id)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class for the app: sync endpoints report their threadpool thread to the profiler."""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            endpoint = track_thread(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+def _requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.lower() in (b"1", b"true", b"yes")
+    query = scope.get("query_string", b"")
+    if b"profile=" in query:
+        values = parse_qs(query.decode("latin-1")).get("profile", [])
+        return any(v.lower() in ("1", "true", "yes") for v in values)
+    return False
+
+
+def _bearer_token(scope) -> Optional[str]:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer" and token:
+                return token
+    return None
+
+
+class ProfilingMiddleware:
+    """``authenticate(token)`` must return truthy only for admins."""
+
+    def __init__(self, app, authenticate: Callable[[str], Awaitable[bool]]):
+        self.app = app
+        self.authenticate = authenticate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+        token = _bearer_token(scope)
+        if token is None or not await self.authenticate(token):
+            # Not an admin: serve the request normally rather than revealing the hook
+            await self.app(scope, receive, send)
+            return
+
+        _install_sql_hooks()
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode("latin-1"))],
+                }
+            await send(message)
+
+        reset = _active.set(profile)
+        # The loop thread runs the middleware stack and async endpoints
+        profile.threads.add(threading.get_ident())
+        started = time.perf_counter()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            profile.stop()
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+            _active.reset(reset)
+            profile.save()
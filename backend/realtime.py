@@ -0,0 +1,281 @@
+"""Push channel for live counter and catalog updates.
+
+Each worker process runs one ``Hub``. Write paths call ``notify_counters`` /
+``notify_catalog`` inside their transaction; on Postgres that becomes a
+``pg_notify`` delivered on commit to every worker's LISTEN connection, so all
+hubs see every change no matter which worker handled the write. SQLite has
+no such channel, so messages are published in the writing process only and
+the hub refuses to start in a second process serving the same database file.
+Updates are coalesced per item and flushed to subscribers at most once per
+interval.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, engine
+
+try:
+    import fcntl
+except ImportError:  # Windows: the single-process check is skipped
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "research_hub"
+COALESCE_SECONDS = float(os.getenv("REALTIME_COALESCE_SECONDS", "1.0"))
+KEEPALIVE_SECONDS = 15.0
+SUBSCRIBER_QUEUE_SIZE = 64
+MAX_TOPICS_PER_CONNECTION = 200
+
+CATALOG_TOPIC = "catalog"
+
+
+def item_topic(kind: str, item_id: int) -> str:
+    return f"{kind}:{item_id}"
+
+
+class Subscriber:
+    __slots__ = ("topics", "queue")
+
+    def __init__(self):
+        self.topics: Set[str] = set()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+
+class Hub:
+    def __init__(self, interval: float = COALESCE_SECONDS):
+        self.interval = interval
+        self._subscribers: Dict[str, Set[Subscriber]] = defaultdict(set)
+        # (topic, type, kind, id) -> latest message; later updates of the same type overwrite
+        # earlier ones, so a catalog change never swallows a counter update or vice versa
+        self._pending: Dict[Tuple[str, str, str, int], dict] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._listener: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._process_lock = None
+
+    @property
+    def connection_count(self) -> int:
+        return len({sub for subs in self._subscribers.values() for sub in subs})
+
+    def subscribe(self, topics: Iterable[str] = ()) -> Subscriber:
+        subscriber = Subscriber()
+        self.add_topics(subscriber, topics)
+        return subscriber
+
+    def add_topics(self, subscriber: Subscriber, topics: Iterable[str]):
+        for topic in topics:
+            if len(subscriber.topics) >= MAX_TOPICS_PER_CONNECTION:
+                break
+            subscriber.topics.add(topic)
+            self._subscribers[topic].add(subscriber)
+
+    def remove_topics(self, subscriber: Subscriber, topics: Iterable[str]):
+        for topic in topics:
+            subscriber.topics.discard(topic)
+            subs = self._subscribers.get(topic)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._subscribers[topic]
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.remove_topics(subscriber, list(subscriber.topics))
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Call listener(message) for every change this worker hears about, subscribed or not."""
+        self._listeners.append(listener)
+
+    def publish(self, message: dict):
+        # Must be called on the hub's event loop thread
+        for listener in self._listeners:
+            try:
+                listener(message)
+            except Exception:
+                logger.exception("Realtime listener failed")
+        topic = message.get("topic")
+        if topic not in self._subscribers:
+            return
+        key = (topic, message.get("type"), message.get("kind"), message.get("id"))
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.update(message)
+        else:
+            self._pending[key] = dict(message)
+
+    def publish_threadsafe(self, message: dict):
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self.publish, message)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        for (topic, *_), message in pending.items():
+            subscribers = self._subscribers.get(topic)
+            if not subscribers:
+                continue
+            # Encode once per message, not once per subscriber
+            payload = json.dumps(message, default=str)
+            for subscriber in subscribers:
+                _offer(subscriber.queue, payload)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self._flush()
+            except Exception:
+                logger.exception("Realtime flush failed")
+
+    def _claim_sqlite(self):
+        # Cache invalidation, similarity refreshes and pushes all ride on these messages,
+        # so a second worker on the same file would serve stale data without any error
+        database = engine.url.database
+        if fcntl is None or not database or database == ":memory:":
+            return
+        lock_file = open(f"{database}.workers.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(
+                f"Another process is already serving {database}. The SQLite backend only "
+                "propagates changes within one process; run a single worker (gunicorn -w 1) or use Postgres."
+            )
+        self._process_lock = lock_file
+
+    async def start(self):
+        if engine.dialect.name == "sqlite":
+            self._claim_sqlite()
+        self._loop = asyncio.get_running_loop()
+        self._stopping.clear()
+        self._flusher = asyncio.create_task(self._flush_loop())
+        if engine.dialect.name == "postgresql":
+            self._listener = threading.Thread(target=self._listen, name="realtime-listener", daemon=True)
+            self._listener.start()
+
+    async def stop(self):
+        self._stopping.set()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._listener is not None:
+            await asyncio.get_running_loop().run_in_executor(None, self._listener.join, 5)
+            self._listener = None
+        if self._process_lock is not None:
+            self._process_lock.close()
+            self._process_lock = None
+
+    def _listen(self):
+        backoff = 1.0
+        while not self._stopping.is_set():
+            raw = None
+            try:
+                raw = engine.raw_connection()
+                raw.detach()
+                conn = raw.driver_connection
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+                backoff = 1.0
+                while not self._stopping.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notification = conn.notifies.pop(0)
+                        try:
+                            self.publish_threadsafe(json.loads(notification.payload))
+                        except ValueError:
+                            logger.warning("Dropping malformed notification: %r", notification.payload)
+            except Exception:
+                logger.exception("Realtime listener disconnected, retrying in %.0fs", backoff)
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 30.0)
+            finally:
+                if raw is not None:
+                    try:
+                        raw.close()
+                    except Exception:
+                        pass
+
+
+def _offer(queue: asyncio.Queue, payload: str):
+    # Slow consumers lose their oldest message rather than stalling the hub
+    try:
+        queue.put_nowait(payload)
+    except asyncio.QueueFull:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            pass
+        queue.put_nowait(payload)
+
+
+hub = Hub()
+
+
+def _notify(db: Session, *messages: dict):
+    if not messages:
+        return
+    if engine.dialect.name == "postgresql":
+        # Delivered to every listening worker (including this one) on commit
+        db.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            [{"channel": NOTIFY_CHANNEL, "payload": json.dumps(message, default=str)} for message in messages],
+        )
+    else:
+        db.info.setdefault("realtime_pending", []).extend(messages)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publish_local(session: Session):
+    for message in session.info.pop("realtime_pending", ()):
+        hub.publish_threadsafe(message)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_local(session: Session):
+    session.info.pop("realtime_pending", None)
+
+
+def notify_counters(db: Session, kind: str, item_id: int, **counters):
+    _notify(db, {"topic": item_topic(kind, item_id), "type": "counters", "kind": kind, "id": item_id, **counters})
+
+
+def notify_catalog(db: Session, kind: str, item_id: int, action: str):
+    notify_catalog_many(db, kind, [item_id], action)
+
+
+def notify_catalog_many(db: Session, kind: str, item_ids: Iterable[int], action: str):
+    messages = []
+    for item_id in item_ids:
+        message = {"type": "catalog", "kind": kind, "id": item_id, "action": action}
+        messages.append({"topic": CATALOG_TOPIC, **message})
+        if action != "created":
+            messages.append({"topic": item_topic(kind, item_id), **message})
+    _notify(db, *messages)
+
+
+def topics_for(
+    events: Optional[Iterable[int]] = None,
+    opportunities: Optional[Iterable[int]] = None,
+    catalog: bool = False,
+) -> Set[str]:
+    topics = {item_topic("event", event_id) for event_id in events or ()}
+    topics.update(item_topic("opportunity", opportunity_id) for opportunity_id in opportunities or ())
+    if catalog:
+        topics.add(CATALOG_TOPIC)
+    return topics
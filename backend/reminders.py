@@ -0,0 +1,271 @@
+"""Deadline reminders for saved opportunities.
+
+Saving an opportunity schedules one reminder for that (user, opportunity),
+due ``REMINDER_LEAD_HOURS`` before the deadline. Unsaving, deleting the
+opportunity or moving its deadline cancels or re-arms it in the same
+transaction as the change, so the ``reminders`` table is always the source of
+truth and a restarted scheduler recovers whatever is still pending.
+
+``ReminderScheduler`` (driven by run_reminders.py) keeps the pending
+triggers in a min-heap of packed ints, ``due second << 64 | user << 32 |
+opportunity``, under 50 bytes each. The heap is loaded once at start and
+topped up by polling for rows changed since the last poll. Entries are never
+removed in place: each due batch is re-read from the table, and entries left
+behind by a reschedule or cancellation are dropped at that point. Due
+reminders are written to the ``outbox`` and marked sent in one transaction
+per batch.
+"""
+import heapq
+import json
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql import func
+
+import models
+from database import engine
+
+LEAD_TIME = timedelta(hours=float(os.getenv("REMINDER_LEAD_HOURS", "48")))
+BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "1000"))
+# updated_at comes from the database clock at transaction start, so a write can
+# commit with a timestamp older than the last one polled; re-read this far back
+POLL_OVERLAP = timedelta(seconds=float(os.getenv("REMINDER_POLL_OVERLAP_SECONDS", "60")))
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+_ID_MASK = (1 << 32) - 1
+
+
+_MARK_SENT = (
+    models.Reminder.__table__.update()
+    .where(models.Reminder.user_id == bindparam("u"), models.Reminder.opportunity_id == bindparam("o"))
+    .values(sent_at=bindparam("now"))
+)
+
+
+def due_for(deadline: Optional[datetime]) -> Optional[datetime]:
+    return deadline - LEAD_TIME if deadline is not None else None
+
+
+def pack(due_at: datetime, user_id: int, opportunity_id: int) -> int:
+    # Rounded up, so an entry never pops before its reminder is due
+    seconds = max(0, -((_EPOCH - due_at) // _SECOND))
+    return seconds << 64 | user_id << 32 | opportunity_id
+
+
+def unpack(entry: int) -> Tuple[int, int, int]:
+    """(due second rounded up, user id, opportunity id)"""
+    return entry >> 64, (entry >> 32) & _ID_MASK, entry & _ID_MASK
+
+
+def _upsert(values: dict):
+    dialect = postgresql if engine.dialect.name == "postgresql" else sqlite
+    statement = dialect.insert(models.Reminder).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[models.Reminder.user_id, models.Reminder.opportunity_id],
+        set_={"due_at": statement.excluded.due_at, "sent_at": None, "updated_at": func.now()},
+    )
+
+
+def schedule(db, user_id: int, opportunity_id: int, deadline: Optional[datetime]):
+    """Arm the reminder for a newly saved opportunity (nothing if the deadline has passed)."""
+    if deadline is None or deadline <= datetime.utcnow():
+        cancel(db, user_id, [opportunity_id])
+        return
+    db.execute(_upsert({"user_id": user_id, "opportunity_id": opportunity_id, "due_at": due_for(deadline)}))
+
+
+def cancel(db, user_id: int, opportunity_ids: Iterable[int]):
+    db.execute(
+        delete(models.Reminder)
+        .where(models.Reminder.user_id == user_id, models.Reminder.opportunity_id.in_(list(opportunity_ids)))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def cancel_opportunities(db, opportunity_ids: Iterable[int]):
+    db.execute(
+        delete(models.Reminder)
+        .where(models.Reminder.opportunity_id.in_(list(opportunity_ids)))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reschedule(db, opportunity_id: int, deadline: Optional[datetime]):
+    """Move every reminder for the opportunity to its new deadline.
+
+    Reminders already due at that time are left alone, sent or not, so
+    rewriting an unchanged deadline never sends a reminder twice; any other
+    reminder is re-armed, including ones sent for the old deadline.
+    """
+    due_at = due_for(deadline)
+    changed = models.Reminder.due_at.is_(None) if due_at is None else or_(
+        models.Reminder.due_at.is_(None), models.Reminder.due_at != due_at
+    )
+    db.execute(
+        update(models.Reminder)
+        .where(models.Reminder.opportunity_id == opportunity_id, changed)
+        .values(due_at=due_at, sent_at=None)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def backfill(db) -> int:
+    """Arm reminders for saves made before reminders existed; returns how many were added."""
+    now = datetime.utcnow()
+    deadlines = dict(
+        db.query(models.ResearchOpportunity.id, models.ResearchOpportunity.deadline)
+        .filter(models.ResearchOpportunity.deadline > now)
+        .all()
+    )
+    existing = set(db.query(models.Reminder.user_id, models.Reminder.opportunity_id).all())
+    rows = []
+    for user_id, saved in db.query(models.User.id, models.User.saved_opportunities).yield_per(5000):
+        for opportunity_id in set(saved or ()):
+            if opportunity_id in deadlines and (user_id, opportunity_id) not in existing:
+                rows.append({"user_id": user_id, "opportunity_id": opportunity_id, "due_at": due_for(deadlines[opportunity_id])})
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(models.Reminder), rows[start:start + BATCH_SIZE])
+    db.commit()
+    return len(rows)
+
+
+class ReminderScheduler:
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        self.batch_size = batch_size
+        self._heap: List[int] = []
+        self._recent: Set[int] = set()
+        self._seen_through: Optional[datetime] = None
+        self.counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def nbytes(self) -> int:
+        return sys.getsizeof(self._heap) + sum(sys.getsizeof(entry) for entry in self._heap)
+
+    def _pending(self, db):
+        return (
+            db.query(models.Reminder.user_id, models.Reminder.opportunity_id, models.Reminder.due_at, models.Reminder.updated_at)
+            .filter(models.Reminder.sent_at.is_(None), models.Reminder.due_at.isnot(None))
+        )
+
+    def _advance(self, updated_at: Optional[datetime]):
+        if updated_at is not None and (self._seen_through is None or updated_at > self._seen_through):
+            self._seen_through = updated_at
+
+    def load(self, db):
+        """Rebuild the heap from every pending reminder in the table."""
+        heap = []
+        for row in self._pending(db).yield_per(10_000):
+            heap.append(pack(row.due_at, row.user_id, row.opportunity_id))
+            self._advance(row.updated_at)
+        heapq.heapify(heap)
+        self._heap = heap
+        self._recent = set()
+        self.counts["loaded"] += len(heap)
+
+    def poll(self, db) -> int:
+        """Push reminders created or moved since the last poll; returns how many were new."""
+        query = self._pending(db)
+        if self._seen_through is not None:
+            query = query.filter(models.Reminder.updated_at >= self._seen_through - POLL_OVERLAP)
+        # Rows inside the overlap come back on every poll until they age out of it;
+        # anything in the previous poll's result is already on the heap
+        recent, pushed = set(), 0
+        for row in query:
+            entry = pack(row.due_at, row.user_id, row.opportunity_id)
+            recent.add(entry)
+            if entry not in self._recent:
+                heapq.heappush(self._heap, entry)
+                pushed += 1
+            self._advance(row.updated_at)
+        self._recent = recent
+        self.counts["polled"] += pushed
+        return pushed
+
+    def next_due(self) -> Optional[datetime]:
+        if not self._heap:
+            return None
+        return _EPOCH + timedelta(seconds=unpack(self._heap[0])[0])
+
+    def pop_due(self, now: datetime, limit: int) -> List[Tuple[int, int]]:
+        cutoff = ((now - _EPOCH) // _SECOND + 1) << 64
+        keys = set()
+        while self._heap and self._heap[0] < cutoff and len(keys) < limit:
+            _, user_id, opportunity_id = unpack(heapq.heappop(self._heap))
+            keys.add((user_id, opportunity_id))
+        return list(keys)
+
+    def dispatch(self, db, now: Optional[datetime] = None) -> int:
+        """Send one batch of due reminders; returns how many heap entries it consumed."""
+        now = now or datetime.utcnow()
+        keys = self.pop_due(now, self.batch_size)
+        if not keys:
+            return 0
+        reminder, opportunity = models.Reminder, models.ResearchOpportunity
+        try:
+            # Two lookups rather than a join on a (user_id, opportunity_id) IN list, which
+            # SQLite answers by scanning or by probing every user x opportunity pair.
+            # Users have few saves each, so fetching theirs and filtering here is cheap
+            wanted = set(keys)
+            pending = [
+                row for row in (
+                    db.query(reminder.user_id, reminder.opportunity_id, reminder.due_at)
+                    .filter(
+                        reminder.user_id.in_({user_id for user_id, _ in keys}),
+                        reminder.sent_at.is_(None),
+                        reminder.due_at <= now,
+                    )
+                    .with_for_update()
+                )
+                if (row.user_id, row.opportunity_id) in wanted
+            ]
+            details = {
+                row.id: row for row in db.query(
+                    opportunity.id, opportunity.title, opportunity.organization, opportunity.type, opportunity.deadline, opportunity.is_active,
+                ).filter(opportunity.id.in_({row.opportunity_id for row in pending}))
+            }
+            rows = [row for row in pending if row.opportunity_id in details]
+            messages = []
+            for row in rows:
+                item = details[row.opportunity_id]
+                # Reminders caught up after the deadline (or for hidden opportunities) are retired unsent
+                if item.is_active is False or item.deadline is None or item.deadline <= now:
+                    self.counts["expired"] += 1
+                    continue
+                messages.append({
+                    "user_id": row.user_id,
+                    "kind": "reminder",
+                    "subject": f"Deadline approaching: {item.title}",
+                    "payload": json.dumps({
+                        "opportunity": {
+                            "id": item.id,
+                            "title": item.title,
+                            "organization": item.organization,
+                            "type": item.type,
+                            "deadline": item.deadline.isoformat(),
+                        },
+                        "due_at": row.due_at.isoformat(),
+                    }),
+                })
+            # Plain executemany on the tables: the ORM bulk paths cost more than the SQL here
+            if messages:
+                db.execute(models.Outbox.__table__.insert(), messages)
+            if rows:
+                db.execute(_MARK_SENT, [{"u": row.user_id, "o": row.opportunity_id, "now": now} for row in rows])
+            db.commit()
+        except Exception:
+            db.rollback()
+            # Put the batch back so the next attempt sees it; the table decides what is still due
+            for user_id, opportunity_id in keys:
+                heapq.heappush(self._heap, pack(now, user_id, opportunity_id))
+            raise
+        self.counts["sent"] += len(messages)
+        self.counts["stale"] += len(keys) - len(rows)
+        return len(keys)
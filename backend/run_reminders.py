@@ -0,0 +1,77 @@
+"""Send deadline reminders for saved opportunities as they come due.
+
+Loads every pending reminder into the scheduler's heap, sends whatever is
+already due in batches (catching up after downtime), then sleeps until the
+next reminder is due or the next poll for new and moved reminders, whichever
+comes first. Reminders go to the ``outbox`` table; see reminders.py.
+
+    python run_reminders.py --poll-seconds 30
+    python run_reminders.py --once   # catch up and exit, e.g. from cron
+"""
+import argparse
+import time
+from datetime import datetime
+
+import models
+import reminders
+from database import SessionLocal, engine
+
+
+def run(batch_size: int, poll_seconds: float, once: bool, backfill: bool):
+    db = SessionLocal()
+    try:
+        if backfill:
+            print(f"Backfilled {reminders.backfill(db):,} reminders for existing saves")
+        scheduler = reminders.ReminderScheduler(batch_size)
+        started = time.perf_counter()
+        scheduler.load(db)
+        db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Loaded {len(scheduler):,} pending reminders in {elapsed:.2f}s ({scheduler.nbytes() / 1024 / 1024:.1f} MiB)")
+
+        next_poll = time.monotonic() + poll_seconds
+        while True:
+            started, consumed = time.perf_counter(), 0
+            while True:
+                batch = scheduler.dispatch(db)
+                consumed += batch
+                if batch < batch_size:
+                    break
+            if consumed:
+                elapsed = time.perf_counter() - started
+                print(
+                    f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} dispatched {consumed:,} in {elapsed:.2f}s "
+                    f"(sent {scheduler.counts['sent']:,}, expired {scheduler.counts['expired']:,}, "
+                    f"stale {scheduler.counts['stale']:,} so far; {len(scheduler):,} pending)"
+                )
+            if once:
+                break
+            next_due = scheduler.next_due()
+            wait = next_poll - time.monotonic()
+            if next_due is not None:
+                wait = min(wait, (next_due - datetime.utcnow()).total_seconds())
+            if wait > 0:
+                time.sleep(wait)
+            if time.monotonic() >= next_poll:
+                scheduler.poll(db)
+                db.commit()
+                next_poll = time.monotonic() + poll_seconds
+    except KeyboardInterrupt:
+        pass
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=reminders.BATCH_SIZE, help="reminders per outbox transaction")
+    parser.add_argument("--poll-seconds", type=float, default=30, help="how often to look for new or moved reminders")
+    parser.add_argument("--once", action="store_true", help="send what is due now and exit")
+    parser.add_argument("--backfill", action="store_true", help="first arm reminders for opportunities saved before reminders existed")
+    args = parser.parse_args()
+    models.Base.metadata.create_all(bind=engine)
+    run(args.batch_size, args.poll_seconds, args.once, args.backfill)
+
+
+if __name__ == "__main__":
+    main()
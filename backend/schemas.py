@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import ClassVar, FrozenSet, Optional, List
 from datetime import datetime
 from enum import Enum
 
@@ -76,6 +76,17 @@ class TokenData(BaseModel):
     user_id: Optional[int] = None
     user_type: Optional[str] = None
 
+class PartialUpdate(BaseModel):
+    # Omitted fields are left alone; an explicit null is only accepted for these
+    nullable_fields: ClassVar[FrozenSet[str]] = frozenset()
+
+    @model_validator(mode="after")
+    def reject_nulls(self):
+        nulls = sorted(f for f in self.model_fields_set if getattr(self, f) is None and f not in self.nullable_fields)
+        if nulls:
+            raise ValueError(f"{', '.join(nulls)} cannot be null")
+        return self
+
 class TechEventBase(BaseModel):
     title: str
     organization: str
@@ -95,12 +106,45 @@ class TechEventBase(BaseModel):
 class TechEventCreate(TechEventBase):
     pass
 
+class TechEventUpdate(PartialUpdate):
+    nullable_fields: ClassVar[FrozenSet[str]] = frozenset({"price"})
+
+    title: Optional[str] = None
+    organization: Optional[str] = None
+    description: Optional[str] = None
+    venue: Optional[str] = None
+    registration_link: Optional[str] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    location: Optional[str] = None
+    type: Optional[EventType] = None
+    price: Optional[str] = None
+    tech_stack: Optional[List[str]] = None
+    speakers: Optional[List[str]] = None
+    virtual: Optional[bool] = None
+    tags: Optional[List[str]] = None
+    is_active: Optional[bool] = None
+
+class TechEventBulkUpdate(PartialUpdate):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    tags: Optional[List[str]] = None
+    type: Optional[EventType] = None
+    is_active: Optional[bool] = None
+
 class TechEvent(TechEventBase):
     id: int
     created_at: datetime
     updated_at: datetime
     attendees: int = 0
     likes: int = 0
+    is_active: Optional[bool] = True
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None  # only set by radius searches
+    similarity: Optional[float] = None  # only set by /similar
+    is_saved: Optional[bool] = None  # only set for signed-in users
+    is_liked: Optional[bool] = None
+    is_registered: Optional[bool] = None
 
     class Config:
         from_attributes = True
@@ -123,12 +167,61 @@ class ResearchOpportunityBase(BaseModel):
 class ResearchOpportunityCreate(ResearchOpportunityBase):
     pass
 
+class ResearchOpportunityUpdate(PartialUpdate):
+    nullable_fields: ClassVar[FrozenSet[str]] = frozenset({"duration", "compensation"})
+
+    title: Optional[str] = None
+    organization: Optional[str] = None
+    description: Optional[str] = None
+    type: Optional[OpportunityType] = None
+    location: Optional[str] = None
+    deadline: Optional[datetime] = None
+    duration: Optional[str] = None
+    compensation: Optional[str] = None
+    requirements: Optional[List[str]] = None
+    fields: Optional[List[str]] = None
+    contact_email: Optional[str] = None
+    virtual: Optional[bool] = None
+    tags: Optional[List[str]] = None
+    is_active: Optional[bool] = None
+
+class ResearchOpportunityBulkUpdate(PartialUpdate):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+    tags: Optional[List[str]] = None
+    type: Optional[OpportunityType] = None
+    is_active: Optional[bool] = None
+
 class ResearchOpportunity(ResearchOpportunityBase):
     id: int
     created_at: datetime
     updated_at: datetime
     applications: int = 0
     likes: int = 0
+    is_active: Optional[bool] = True
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    distance_km: Optional[float] = None  # only set by radius searches
+    similarity: Optional[float] = None  # only set by /similar
+    is_saved: Optional[bool] = None  # only set for signed-in users
+    is_liked: Optional[bool] = None
+    has_applied: Optional[bool] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BulkDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class BulkResult(BaseModel):
+    affected: int
+    ids: List[int]
+
+class EventConflict(BaseModel):
+    id: int
+    title: str
+    start_date: datetime
+    end_date: Optional[datetime] = None
+
+class ScheduleEntry(BaseModel):
+    event: TechEvent
+    conflicts: List[int] = []  # ids of saved events overlapping this one
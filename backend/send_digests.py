@@ -0,0 +1,287 @@
+"""Write a digest of new research opportunities to every user whose interests match.
+
+New opportunities are those created since the checkpoint left by the last
+run; the first run only records where the catalog ends, so pass ``--since``
+to digest anything older. ``created_at`` comes from the database clock at
+transaction start, so an opportunity can commit after a run with an older
+timestamp than one that run saw; each run re-reads ``DIGEST_OVERLAP_SECONDS``
+back and skips the ids the checkpoint records as already sent inside that
+overlap. A run fixes its set of opportunity ids on the checkpoint before
+matching, loads them once and turns them into an inverted index from
+normalized term (field, tag or type) to opportunity ids. Users are then
+streamed in id order in chunks of (id, interests); a process pool matches
+each chunk against the index, and the main process writes the digests to
+the ``outbox`` table and advances the run's user cursor in the same
+transaction. A run that dies part way resumes from that cursor with the same
+opportunities, so nobody gets a digest twice.
+
+The checkpoint row is locked while a run claims it and records the run as its
+owner; every later write is conditional on still being the owner. A second
+run started while the first is alive exits, and one started after the owner
+has made no progress for ``DIGEST_LEASE_SECONDS`` takes over from its cursor.
+
+    python send_digests.py --workers 4 --chunk-size 5000
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert
+from sqlalchemy.exc import IntegrityError
+
+import models
+from database import SessionLocal, engine
+
+JOB_NAME = "opportunity_digest"
+OVERLAP = timedelta(seconds=float(os.getenv("DIGEST_OVERLAP_SECONDS", "300")))
+LEASE = timedelta(seconds=float(os.getenv("DIGEST_LEASE_SECONDS", "600")))
+LOAD_BATCH = 5000
+
+_index: Dict[str, List[int]] = {}
+_items: Dict[int, dict] = {}
+_max_items = 10
+
+
+def normalize(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+def build_index(opportunities) -> Tuple[Dict[str, List[int]], Dict[int, dict]]:
+    index = defaultdict(list)
+    items = {}
+    for opportunity in opportunities:
+        terms = {normalize(t) for t in (opportunity.fields or []) + (opportunity.tags or []) if t}
+        if opportunity.type:
+            terms.add(normalize(opportunity.type))
+        for term in terms:
+            index[term].append(opportunity.id)
+        items[opportunity.id] = {
+            "id": opportunity.id,
+            "title": opportunity.title,
+            "organization": opportunity.organization,
+            "type": opportunity.type,
+            "deadline": opportunity.deadline.isoformat() if opportunity.deadline else None,
+        }
+    return dict(index), items
+
+
+def _init_worker(index, items, max_items):
+    global _index, _items, _max_items
+    _index, _items, _max_items = index, items, max_items
+
+
+def match_chunk(users: List[Tuple[int, List[str]]]) -> List[Tuple[int, List[dict]]]:
+    """Digest entries for each user in the chunk with at least one match."""
+    digests = []
+    for user_id, interests in users:
+        hits = Counter()
+        matched = defaultdict(list)
+        for interest in {normalize(i) for i in interests or [] if i}:
+            for item_id in _index.get(interest, ()):
+                hits[item_id] += 1
+                matched[item_id].append(interest)
+        if not hits:
+            continue
+        # Most matching interests first, then the soonest deadline
+        ranked = sorted(hits, key=lambda i: (-hits[i], _items[i]["deadline"] or "9999", i))[:_max_items]
+        digests.append((user_id, [{**_items[i], "matched": sorted(matched[i])} for i in ranked]))
+    return digests
+
+
+def _stream_users(db, after: int, chunk_size: int):
+    while True:
+        rows = (
+            db.query(models.User.id, models.User.interests)
+            .filter(models.User.id > after, models.User.is_active.isnot(False))
+            .order_by(models.User.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not rows:
+            return
+        after = rows[-1].id
+        yield after, len(rows), [(row.id, list(row.interests or [])) for row in rows if row.interests]
+
+
+def _run_inline(fn, *args) -> Future:
+    future = Future()
+    future.set_result(fn(*args))
+    return future
+
+
+def _claim(db, run_id: str, since: Optional[datetime]) -> Optional[models.JobCheckpoint]:
+    """Lock the checkpoint and take the job for this run; None if a live run already holds it."""
+    checkpoint = db.query(models.JobCheckpoint).filter(models.JobCheckpoint.name == JOB_NAME).with_for_update().first()
+    if checkpoint is None:
+        db.add(models.JobCheckpoint(name=JOB_NAME))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another run created it first
+            db.rollback()
+        checkpoint = db.query(models.JobCheckpoint).filter(models.JobCheckpoint.name == JOB_NAME).with_for_update().one()
+    now = datetime.utcnow()
+    if checkpoint.owner is not None:
+        if checkpoint.heartbeat_at is not None and now - checkpoint.heartbeat_at < LEASE:
+            db.rollback()
+            return None
+        print(f"Taking over from run {checkpoint.owner}, idle since {checkpoint.heartbeat_at}")
+    checkpoint.owner, checkpoint.heartbeat_at = run_id, now
+    if since is not None:
+        checkpoint.pending_ids = None
+    if checkpoint.pending_ids is None:
+        opportunity = models.ResearchOpportunity
+        if since is None and checkpoint.seen_through is None:
+            # First run: count the existing catalog as sent rather than digesting all of it
+            latest = db.query(func.max(opportunity.created_at)).scalar() or now
+            checkpoint.seen_through = latest
+            checkpoint.seen_ids = sorted(
+                row.id for row in db.query(opportunity.id).filter(opportunity.created_at >= latest - OVERLAP)
+            )
+            print(f"First run: starting after opportunities created through {latest} (use --since to go further back)")
+        query = db.query(opportunity.id, opportunity.created_at)
+        if since is not None:
+            query, seen = query.filter(opportunity.created_at >= since), set()
+        else:
+            query, seen = query.filter(opportunity.created_at >= checkpoint.seen_through - OVERLAP), set(checkpoint.seen_ids or [])
+        rows = [row for row in query if row.id not in seen]
+        checkpoint.pending_ids = sorted(row.id for row in rows)
+        base = since if since is not None else checkpoint.seen_through
+        checkpoint.pending_through = max(
+            [row.created_at for row in rows if row.created_at is not None] + ([base] if base is not None else []), default=None
+        )
+        checkpoint.cursor = 0
+    else:
+        print(f"Resuming unfinished run after user {checkpoint.cursor}")
+    db.commit()
+    return checkpoint
+
+
+def _save(db, run_id: str, **values):
+    """Write to the checkpoint in the current transaction, provided this run still owns it."""
+    updated = (
+        db.query(models.JobCheckpoint)
+        .filter(models.JobCheckpoint.name == JOB_NAME, models.JobCheckpoint.owner == run_id)
+        .update({**values, "heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+    )
+    if updated != 1:
+        raise RuntimeError(f"Run {run_id} lost the {JOB_NAME} checkpoint to another run")
+
+
+def _load(db, ids: List[int]) -> List[models.ResearchOpportunity]:
+    opportunity = models.ResearchOpportunity
+    loaded = []
+    for start in range(0, len(ids), LOAD_BATCH):
+        loaded += (
+            db.query(opportunity)
+            .filter(opportunity.id.in_(ids[start:start + LOAD_BATCH]), opportunity.is_active.isnot(False))
+            .all()
+        )
+    return loaded
+
+
+def send_digests(workers: int, chunk_size: int, max_items: int, since: Optional[datetime] = None):
+    db = SessionLocal()
+    run_id = uuid.uuid4().hex
+    try:
+        checkpoint = _claim(db, run_id, since)
+        if checkpoint is None:
+            print("Another digest run is in progress")
+            return
+        pending_ids, through, cursor = list(checkpoint.pending_ids), checkpoint.pending_through, checkpoint.cursor or 0
+
+        opportunities = [o for o in _load(db, pending_ids) if o.deadline is None or o.deadline >= datetime.utcnow()]
+        index, items = build_index(opportunities)
+        print(f"{len(items)} new opportunities (created through {through}), {len(index)} distinct terms")
+
+        started = time.perf_counter()
+        users = digests = 0
+        if items:
+            if workers > 0:
+                pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(index, items, max_items))
+                submit = pool.submit
+            else:
+                pool = None
+                _init_worker(index, items, max_items)
+                submit = _run_inline
+            try:
+                # Results are written in submission order so the cursor only ever covers finished users
+                in_flight = deque()
+                chunks = _stream_users(db, cursor, chunk_size)
+                while True:
+                    while len(in_flight) < max(1, workers * 2):
+                        chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        last_id, scanned, batch = chunk
+                        in_flight.append((last_id, scanned, submit(match_chunk, batch)))
+                    if not in_flight:
+                        break
+                    last_id, scanned, result = in_flight.popleft()
+                    chunk_digests = result.result()
+                    if chunk_digests:
+                        db.execute(insert(models.Outbox), [
+                            {
+                                "user_id": user_id,
+                                "kind": "digest",
+                                "subject": f"{len(entries)} new research opportunities matching your interests",
+                                "payload": json.dumps({"opportunities": entries}),
+                            }
+                            for user_id, entries in chunk_digests
+                        ])
+                    _save(db, run_id, cursor=last_id)
+                    db.commit()
+                    users += scanned
+                    digests += len(chunk_digests)
+                    elapsed = time.perf_counter() - started
+                    print(f"  users {users:,}  digests {digests:,}  {users / elapsed if elapsed else 0:,.0f} users/s")
+            finally:
+                if pool is not None:
+                    pool.shutdown()
+
+        # Remember what was sent inside the overlap the next run re-reads
+        seen_ids = []
+        if through is not None:
+            candidates = set(checkpoint.seen_ids or []) | set(pending_ids)
+            recent = {
+                row.id for row in
+                db.query(models.ResearchOpportunity.id).filter(models.ResearchOpportunity.created_at >= through - OVERLAP)
+            }
+            seen_ids = sorted(candidates & recent)
+        _save(
+            db, run_id,
+            seen_through=through, seen_ids=seen_ids,
+            pending_through=None, pending_ids=None, cursor=None, owner=None,
+        )
+        db.commit()
+        elapsed = time.perf_counter() - started
+        print(f"Matched {users:,} users in {elapsed:.2f}s ({users / elapsed if elapsed else 0:,.0f} users/s), wrote {digests:,} digests")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="matching processes (0 runs inline)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="users per chunk")
+    parser.add_argument("--max-items", type=int, default=10, help="opportunities per digest")
+    parser.add_argument(
+        "--since", type=datetime.fromisoformat,
+        help="treat opportunities created at or after this time (e.g. 2030-01-01T00:00) as new, ignoring the checkpoint",
+    )
+    args = parser.parse_args()
+    models.Base.metadata.create_all(bind=engine)
+    send_digests(args.workers, args.chunk_size, args.max_items, args.since)
+
+
+if __name__ == "__main__":
+    main()
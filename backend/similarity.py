@@ -0,0 +1,212 @@
+"""Item-to-item similarity from MinHash signatures bucketed with LSH.
+
+Each item is reduced to a set of tokens (tags, tech stack or research fields,
+and title words). A ``NUM_PERM``-value MinHash signature estimates Jaccard
+similarity between those sets, and splitting it into ``BANDS`` bands of
+``ROWS`` values puts items sharing any whole band in the same bucket. Lookups
+only score the item's bucket-mates (exactly, on the token sets) instead of
+the whole catalog, and the ranked result is memoized until that kind changes.
+
+Every worker keeps its own index. It is built at startup and kept fresh by
+marking items dirty from the realtime catalog messages, which reach every
+worker including the one that made the write. Dirty items are re-read and
+re-indexed by a queued refresh, or by the next lookup if that comes first.
+
+Rebuilds and refreshes are serialized by their own lock and read the database
+without holding the index lock, so lookups keep being answered from the
+current index meanwhile. Each takes the dirty set before reading, so items
+marked while it reads stay dirty for the next refresh.
+"""
+import logging
+import random
+import re
+import threading
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+import models
+
+logger = logging.getLogger(__name__)
+
+NUM_PERM = 96
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250101)
+_COEFFICIENTS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+_WORD = re.compile(r"[a-z0-9+#]+")
+_STOPWORDS = {"the", "and", "for", "with", "from", "into", "your", "our", "about", "event", "opportunity"}
+
+# kind -> (model, columns holding token lists, prefix per column)
+KINDS = {
+    "event": (models.TechEvent, {"tags": "tag", "tech_stack": "stack"}),
+    "opportunity": (models.ResearchOpportunity, {"tags": "tag", "fields": "field"}),
+}
+
+Signature = Tuple[int, ...]
+
+
+def tokens(title: Optional[str], **lists: Iterable[str]) -> FrozenSet[str]:
+    result = set()
+    for prefix, values in lists.items():
+        result.update(f"{prefix}:{value.strip().lower()}" for value in values or () if value and value.strip())
+    for word in _WORD.findall((title or "").lower()):
+        if len(word) > 2 and word not in _STOPWORDS:
+            result.add(f"title:{word}")
+    return frozenset(result)
+
+
+@lru_cache(maxsize=100_000)
+def _token_hashes(token: str) -> Tuple[int, ...]:
+    value = int.from_bytes(blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+    return tuple((a * value + b) % _PRIME for a, b in _COEFFICIENTS)
+
+
+def signature(token_set: FrozenSet[str]) -> Optional[Signature]:
+    if not token_set:
+        return None
+    return tuple(min(column) for column in zip(*(_token_hashes(t) for t in token_set)))
+
+
+def _bands(sig: Signature) -> List[int]:
+    return [hash(sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class _KindIndex:
+    def __init__(self):
+        self.tokens: Dict[int, FrozenSet[str]] = {}
+        self.bands: Dict[int, List[int]] = {}
+        self.buckets: List[Dict[int, Set[int]]] = [{} for _ in range(BANDS)]
+        self.results: Dict[Tuple[int, int], List[Tuple[int, float]]] = {}
+
+    def remove(self, item_id: int):
+        self.tokens.pop(item_id, None)
+        for band, key in enumerate(self.bands.pop(item_id, ())):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(item_id)
+                if not bucket:
+                    del self.buckets[band][key]
+
+    def add(self, item_id: int, token_set: FrozenSet[str]):
+        self.remove(item_id)
+        sig = signature(token_set)
+        if sig is None:
+            return
+        self.tokens[item_id] = token_set
+        self.bands[item_id] = _bands(sig)
+        for band, key in enumerate(self.bands[item_id]):
+            self.buckets[band].setdefault(key, set()).add(item_id)
+
+
+class SimilarityIndex:
+    def __init__(self):
+        self._kinds = {kind: _KindIndex() for kind in KINDS}
+        self._dirty: Dict[str, Set[int]] = {kind: set() for kind in KINDS}
+        self._lock = threading.RLock()
+        # Serializes rebuilds and refreshes, which read the database outside _lock
+        self._update_lock = threading.Lock()
+        self.ready = False
+
+    def _rows(self, db, kind: str, ids: Optional[Iterable[int]] = None):
+        model, columns = KINDS[kind]
+        query = db.query(model.id, model.title, *(getattr(model, c) for c in columns)).filter(model.is_active.isnot(False))
+        if ids is not None:
+            query = query.filter(model.id.in_(list(ids)))
+        for row in query:
+            yield row.id, tokens(row.title, **{prefix: getattr(row, column) for column, prefix in columns.items()})
+
+    def rebuild(self, db):
+        with self._update_lock:
+            self._rebuild(db)
+
+    def _rebuild(self, db):
+        with self._lock:
+            # Anything marked from here on may be newer than what we read
+            taken, self._dirty = self._dirty, {kind: set() for kind in KINDS}
+        kinds = {kind: _KindIndex() for kind in KINDS}
+        try:
+            for kind, index in kinds.items():
+                for item_id, token_set in self._rows(db, kind):
+                    index.add(item_id, token_set)
+        except Exception:
+            self._restore(taken)
+            raise
+        with self._lock:
+            self._kinds = kinds
+            self.ready = True
+
+    def _restore(self, dirty: Dict[str, Set[int]]):
+        # A failed read leaves its items for the next refresh
+        with self._lock:
+            for kind, item_ids in dirty.items():
+                self._dirty[kind] |= item_ids
+
+    def mark_dirty(self, kind: str, item_ids: Iterable[int]):
+        if kind in self._dirty:
+            with self._lock:
+                self._dirty[kind].update(item_ids)
+
+    def refresh(self, db, kind: str, wait: bool = True):
+        """Re-index the dirty items of kind; with wait=False, skip if an update is already running."""
+        if not self._dirty[kind]:
+            return
+        if not self._update_lock.acquire(blocking=wait):
+            return
+        try:
+            with self._lock:
+                dirty, self._dirty[kind] = self._dirty[kind], set()
+            if not dirty:
+                return
+            try:
+                rows = list(self._rows(db, kind, dirty))
+            except Exception:
+                self._restore({kind: dirty})
+                raise
+            with self._lock:
+                index = self._kinds[kind]
+                # Deleted or deactivated items simply don't come back from the query
+                for item_id in dirty:
+                    index.remove(item_id)
+                for item_id, token_set in rows:
+                    index.add(item_id, token_set)
+                index.results.clear()
+        finally:
+            self._update_lock.release()
+
+    def similar(self, db, kind: str, item_id: int, limit: int = 10) -> Optional[List[Tuple[int, float]]]:
+        """(id, jaccard) of the most similar items, or None if the item isn't indexed."""
+        if not self.ready:
+            with self._update_lock:
+                if not self.ready:
+                    self._rebuild(db)
+        # A refresh already under way is left to finish; this lookup uses the index as it stands
+        self.refresh(db, kind, wait=False)
+        with self._lock:
+            index = self._kinds[kind]
+            if item_id not in index.tokens:
+                return None
+            cached = index.results.get((item_id, limit))
+            if cached is not None:
+                return cached
+            own = index.tokens[item_id]
+            candidates = set()
+            for band, key in enumerate(index.bands[item_id]):
+                candidates |= index.buckets[band].get(key, set())
+            candidates.discard(item_id)
+            scored = [(other, jaccard(own, index.tokens[other])) for other in candidates]
+            ranked = sorted((s for s in scored if s[1] > 0), key=lambda s: (-s[1], s[0]))[:limit]
+            result = [(other, round(score, 4)) for other, score in ranked]
+            index.results[(item_id, limit)] = result
+            return result
+
+
+index = SimilarityIndex()
@@ -0,0 +1,225 @@
+"""Slow-query capture.
+
+Every statement executed through the engine is timed. Statements slower than
+``SLOW_QUERY_MS`` are kept in a bounded ring buffer together with their
+normalized SQL, the shape of their bound parameters, the endpoint that ran
+them and the row count. A ``SLOW_QUERY_EXPLAIN_RATE`` fraction of slow SELECTs
+also gets its plan captured (EXPLAIN ANALYZE on Postgres, EXPLAIN QUERY PLAN on
+SQLite) on a background thread and a separate connection, so the request that
+triggered it is not slowed down further.
+
+EXPLAIN ANALYZE runs the statement again, so Postgres only gets it for plain
+reads. SELECTs that take row locks (FOR UPDATE/SHARE, which would wait behind
+the transaction that ran them), write a table (SELECT INTO) or call a function
+not known to be free of side effects (pg_notify, nextval, ...) get a plain
+EXPLAIN instead.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import count
+from typing import List, Optional
+
+from sqlalchemy import event
+
+from database import engine
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+EXPLAIN_RATE = float(os.getenv("SLOW_QUERY_EXPLAIN_RATE", "0.1"))
+BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "200"))
+MAX_PENDING_EXPLAINS = 4
+
+_current_request = contextvars.ContextVar("slow_query_request", default=None)
+
+_entries = deque(maxlen=BUFFER_SIZE)
+_lock = threading.Lock()
+_ids = count(1)
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+_pending_explains = 0
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|:\w+|__\[POSTCOMPILE_\w+\]")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,?)+\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+_LOCKING = re.compile(r"\bFOR\s+(?:NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b|\bINTO\b", re.IGNORECASE)
+_CALL = re.compile(r"([A-Za-z_][\w.]*)\s*\(")
+# Words followed by "(" that are syntax or functions without side effects; anything else may write
+_SAFE_CALLS = {
+    "select", "from", "join", "in", "exists", "any", "all", "as", "on", "and", "or", "not", "values", "over",
+    "filter", "within", "using", "where", "when", "then", "else", "case", "lateral", "cast", "extract",
+    "count", "sum", "min", "max", "avg", "coalesce", "nullif", "greatest", "least", "lower", "upper",
+    "length", "abs", "round", "now", "date_trunc", "array_length", "unnest", "json_each", "jsonb_array_elements",
+    "row_number", "rank", "dense_rank", "string_agg", "array_agg",
+}
+
+
+def normalize(statement: str) -> str:
+    sql = _STRING_LITERAL.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def parameter_shape(parameters, executemany: bool = False):
+    if executemany and parameters:
+        return {"executemany": len(parameters), "row": parameter_shape(parameters[0])}
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+def analyze_safe(statement: str) -> bool:
+    """Whether running the SELECT again under EXPLAIN ANALYZE can neither block nor write."""
+    sql = _STRING_LITERAL.sub("?", statement)
+    if _LOCKING.search(sql):
+        return False
+    return all(name.lower().rsplit(".", 1)[-1] in _SAFE_CALLS for name in _CALL.findall(sql))
+
+
+def _endpoint() -> Optional[str]:
+    scope = _current_request.get()
+    if scope is None:
+        return None
+    # Resolved lazily: routing has happened by the time the handler queries the database
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path")
+    return f"{scope.get('method')} {path}"
+
+
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("slow_query_start")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    if duration_ms < SLOW_QUERY_MS or conn.info.get("slow_query_explaining"):
+        return
+    entry = {
+        "id": next(_ids),
+        "recorded_at": datetime.utcnow().isoformat(),
+        "duration_ms": round(duration_ms, 3),
+        "normalized": normalize(statement),
+        "statement": statement[:2000],
+        "parameter_shape": parameter_shape(parameters, executemany),
+        "endpoint": _endpoint(),
+        "rowcount": cursor.rowcount,
+        "plan": None,
+        "analyzed": False,
+    }
+    with _lock:
+        _entries.append(entry)
+    if not executemany and statement.lstrip().upper().startswith("SELECT") and random.random() < EXPLAIN_RATE:
+        _schedule_explain(entry, statement, parameters)
+
+
+def _schedule_explain(entry: dict, statement: str, parameters):
+    global _pending_explains
+    with _lock:
+        if _pending_explains >= MAX_PENDING_EXPLAINS:
+            return
+        _pending_explains += 1
+    _explainer.submit(_explain, entry, statement, parameters)
+
+
+def _explain(entry: dict, statement: str, parameters):
+    global _pending_explains
+    try:
+        if engine.dialect.name == "postgresql":
+            analyze = analyze_safe(statement)
+            prefix = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " if analyze else "EXPLAIN (FORMAT JSON) "
+            entry["analyzed"] = analyze
+        else:
+            prefix = "EXPLAIN QUERY PLAN "
+        with engine.connect() as conn:
+            conn.info["slow_query_explaining"] = True
+            try:
+                rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+            finally:
+                conn.info.pop("slow_query_explaining", None)
+                conn.rollback()
+        if engine.dialect.name == "postgresql":
+            plan = rows[0][0]
+            entry["plan"] = plan if not isinstance(plan, str) else json.loads(plan)
+        else:
+            entry["plan"] = [list(row) for row in rows]
+    except Exception as e:
+        entry["plan"] = {"error": str(e)}
+    finally:
+        with _lock:
+            _pending_explains -= 1
+
+
+def entries(endpoint: Optional[str] = None, limit: int = 100) -> List[dict]:
+    with _lock:
+        snapshot = list(_entries)
+    if endpoint:
+        snapshot = [e for e in snapshot if e["endpoint"] and endpoint in e["endpoint"]]
+    return list(reversed(snapshot))[:limit]
+
+
+def summary() -> List[dict]:
+    """Buffered slow queries grouped by normalized SQL, worst total time first."""
+    groups = {}
+    with _lock:
+        snapshot = list(_entries)
+    for entry in snapshot:
+        group = groups.setdefault(entry["normalized"], {
+            "normalized": entry["normalized"],
+            "count": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "endpoints": set(),
+        })
+        group["count"] += 1
+        group["total_ms"] += entry["duration_ms"]
+        group["max_ms"] = max(group["max_ms"], entry["duration_ms"])
+        if entry["endpoint"]:
+            group["endpoints"].add(entry["endpoint"])
+    result = []
+    for group in groups.values():
+        group["total_ms"] = round(group["total_ms"], 3)
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 3)
+        group["endpoints"] = sorted(group["endpoints"])
+        result.append(group)
+    return sorted(result, key=lambda g: g["total_ms"], reverse=True)
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+class RequestContextMiddleware:
+    """Remember the current request so slow statements can be attributed to an endpoint."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _current_request.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_request.reset(token)
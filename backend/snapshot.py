@@ -0,0 +1,331 @@
+"""Read-only catalog snapshot shared by every worker through mmap.
+
+The snapshot is one file holding the serialized JSON of every active event
+and opportunity, an id index (sorted ids with parallel offset and length
+arrays) and the default list order (start_date for events, deadline for
+opportunities) as positions into that index. Workers map it read-only, so
+the pages are shared between processes; detail lookups are a binary search
+and the default list pages are slices of the order array, so serving them
+costs one small counter query rather than loading and serializing rows.
+
+Counters (likes, registrations, applications) change far more often than
+the catalog, so they are not what a snapshot is rebuilt for. Each record's
+counters are also stored in per-column arrays, and lookups read the live
+values for the ids being served with one primary-key query; only records
+whose counters moved since the build are decoded and re-encoded. Live
+counters win over speed here: a snapshot hit never shows a counter older
+than the database, but that query is most of what a hit costs. Detail
+lookups end up close to the plain database path, while list pages still skip
+the sort and the serialization (``bench_snapshot.py`` measures all three).
+
+Writers ``invalidate()`` the file right after committing, so readers fall
+back to the database, and queue ``catalog.publish()``. Invalidating bumps a
+stamp file; a build notes the stamp before reading the database and only
+replaces the file if it is unchanged, so a build that raced a commit on
+another worker never publishes what it read. Builds are serialized by a lock
+file, and a build that started after a request was made satisfies it, so a
+burst of writes across workers produces one or two builds rather than one
+each. The new file replaces the old with ``os.replace``; readers notice the
+new inode on their next lookup and remap, while requests still reading the
+old mapping keep it alive until they finish.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import engagement
+import models
+import schemas
+from database import SessionLocal
+
+try:
+    import fcntl
+except ImportError:  # Windows: builds are only serialized within a process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_ENABLED = os.getenv("CATALOG_SNAPSHOT", "1").lower() not in ("0", "false", "no")
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+
+_MAGIC = b"CSN1"
+_FORMAT = 2
+_HEADER = struct.Struct("<4sIQdI")
+_STAMP = struct.Struct("<Q")
+
+# kind -> (model, response schema, default list order)
+KINDS = {
+    "event": (models.TechEvent, schemas.TechEvent, lambda m: (m.start_date.asc(), m.id.asc())),
+    "opportunity": (models.ResearchOpportunity, schemas.ResearchOpportunity, lambda m: (m.deadline.asc(), m.id.asc())),
+}
+# kind -> counter columns served live rather than from the snapshot
+COUNTERS = {kind: tuple(actions.values()) for kind, actions in engagement.TRACKED_ACTIONS.items()}
+
+
+def _dumps(value) -> bytes:
+    # Same encoding as FastAPI's JSONResponse, so raw slices can be sent as-is
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % 8)
+
+
+class Snapshot:
+    """One mapped generation of the snapshot file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self.key = (stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.generation, self.started_at, toc_length = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or version != _FORMAT:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        toc_end = _HEADER.size + toc_length
+        toc = json.loads(self._map[_HEADER.size:toc_end])
+        self._base = toc_end + (-toc_end % 8)
+        view = memoryview(self._map)
+        self._sections = {}
+        for kind, section in toc.items():
+            count = section["count"]
+            arrays = {}
+            for name, width, code in (("ids", 4, "I"), ("offsets", 8, "Q"), ("lengths", 4, "I"), ("order", 4, "I")):
+                at = self._base + section[name]
+                arrays[name] = view[at:at + width * count].cast(code)
+            arrays["counters"] = {}
+            for name, at in section["counters"].items():
+                at += self._base
+                arrays["counters"][name] = view[at:at + 8 * count].cast("q")
+            self._sections[kind] = arrays
+
+    def _record(self, section, position: int) -> Tuple[int, bytes, Dict[str, int]]:
+        """(id, stored JSON, counters as of the build)"""
+        offset = self._base + section["offsets"][position]
+        counters = {name: values[position] for name, values in section["counters"].items()}
+        return section["ids"][position], self._map[offset:offset + section["lengths"][position]], counters
+
+    def get(self, kind: str, item_id: int) -> Optional[Tuple[int, bytes, Dict[str, int]]]:
+        section = self._sections[kind]
+        ids = section["ids"]
+        position = bisect_left(ids, item_id)
+        if position < len(ids) and ids[position] == item_id:
+            return self._record(section, position)
+        return None
+
+    def page(self, kind: str, skip: int, limit: int) -> List[Tuple[int, bytes, Dict[str, int]]]:
+        section = self._sections[kind]
+        return [self._record(section, position) for position in section["order"][skip:skip + limit]]
+
+    def count(self, kind: str) -> int:
+        return len(self._sections[kind]["ids"])
+
+
+def build(path: str, generation: int):
+    """Write a snapshot of the current database state to path (not atomically)."""
+    started_at = time.time()
+    db = SessionLocal()
+    try:
+        sections = {}
+        for kind, (model, schema, order) in KINDS.items():
+            items = db.query(model).filter(model.is_active.isnot(False)).order_by(*order(model)).all()
+            records = [
+                (item.id, _dumps(schema.model_validate(item).model_dump(mode="json")), [getattr(item, name) or 0 for name in COUNTERS[kind]])
+                for item in items
+            ]
+            sections[kind] = records
+    finally:
+        db.close()
+
+    # Index arrays are native-endian (the file never leaves the host) and every region is
+    # 8-byte aligned; table-of-contents offsets are relative to the data start
+    blobs = []
+    layout = {}
+    position = 0
+
+    def append(blob: bytes) -> int:
+        nonlocal position
+        at = position
+        blobs.append(blob + _pad(len(blob)))
+        position += len(blobs[-1])
+        return at
+
+    for kind, records in sections.items():
+        count = len(records)
+        by_id = sorted(range(count), key=lambda i: records[i][0])
+        position_of = {original: rank for rank, original in enumerate(by_id)}
+        records_at = append(b"".join(records[i][1] for i in by_id))
+        offsets, cursor = [], records_at
+        for i in by_id:
+            offsets.append(cursor)
+            cursor += len(records[i][1])
+        layout[kind] = {
+            "count": count,
+            "ids": append(array("I", (records[i][0] for i in by_id)).tobytes()),
+            "offsets": append(array("Q", offsets).tobytes()),
+            "lengths": append(array("I", (len(records[i][1]) for i in by_id)).tobytes()),
+            "order": append(array("I", (position_of[i] for i in range(count))).tobytes()),
+            "counters": {
+                name: append(array("q", (records[i][2][column] for i in by_id)).tobytes())
+                for column, name in enumerate(COUNTERS[kind])
+            },
+        }
+
+    toc = json.dumps(layout).encode("utf-8")
+    header = _HEADER.pack(_MAGIC, _FORMAT, generation, started_at, len(toc)) + toc
+    with open(path, "wb") as f:
+        f.write(header + _pad(len(header)))
+        for blob in blobs:
+            f.write(blob)
+
+
+class CatalogSnapshot:
+    def __init__(self, directory: str = SNAPSHOT_DIR, enabled: bool = SNAPSHOT_ENABLED):
+        self.enabled = enabled
+        self.path = os.path.join(directory, "catalog.bin")
+        self._lock_path = os.path.join(directory, "catalog.lock")
+        self._stamp_path = os.path.join(directory, "catalog.stamp")
+        self._directory = directory
+        self._current: Optional[Snapshot] = None
+        self._generation = 0
+        self._build_lock = threading.Lock()
+        self._stamp_lock = threading.Lock()
+        self.builds = 0
+        self.discarded = 0
+
+    def current(self) -> Optional[Snapshot]:
+        """The newest published snapshot, remapping if another worker replaced the file."""
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._current = None
+            return None
+        current = self._current
+        if current is None or current.key != (stat.st_ino, stat.st_mtime_ns):
+            try:
+                current = self._current = Snapshot(self.path)
+                self._generation = max(self._generation, current.generation)
+            except (OSError, ValueError):
+                logger.exception("Could not map catalog snapshot")
+                self._current = None
+                return None
+        return current
+
+    def get(self, db, kind: str, item_id: int) -> Optional[bytes]:
+        return self.many(db, kind, [item_id]).get(item_id)
+
+    def many(self, db, kind: str, item_ids: List[int]) -> Dict[int, bytes]:
+        """id -> JSON for the requested ids that are in the snapshot."""
+        current = self.current()
+        if current is None:
+            return {}
+        records = [record for record in (current.get(kind, item_id) for item_id in item_ids) if record is not None]
+        return dict(self._with_counters(db, kind, records))
+
+    def page(self, db, kind: str, skip: int, limit: int) -> Optional[List[bytes]]:
+        current = self.current()
+        if current is None or skip < 0 or limit < 0:
+            return None
+        return [record for _, record in self._with_counters(db, kind, current.page(kind, skip, limit))]
+
+    def _with_counters(self, db, kind: str, records) -> List[Tuple[int, bytes]]:
+        """(id, stored JSON) of each record, patched where its counters have moved since the build."""
+        if not records:
+            return []
+        live = engagement.counters(db, kind, [item_id for item_id, _, _ in records])
+        result = []
+        for item_id, record, stored in records:
+            if item_id not in live:
+                # Deleted since the build, and the invalidation has not reached us yet
+                continue
+            changed = {name: value for name, value in live[item_id].items() if value != stored[name]}
+            result.append((item_id, _dumps({**json.loads(record), **changed}) if changed else record))
+        return result
+
+    @contextmanager
+    def _stamp(self):
+        """Hold the invalidation stamp exclusively; yields (descriptor, current value)."""
+        os.makedirs(self._directory, exist_ok=True)
+        fd = os.open(self._stamp_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with self._stamp_lock:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                data = os.read(fd, _STAMP.size)
+                yield fd, _STAMP.unpack(data)[0] if len(data) == _STAMP.size else 0
+        finally:
+            os.close(fd)
+
+    def publish(self, requested_at: Optional[float] = None):
+        """Rebuild from the database unless a build that started after requested_at already did."""
+        if not self.enabled:
+            return
+        requested_at = time.time() if requested_at is None else requested_at
+        os.makedirs(self._directory, exist_ok=True)
+        with self._build_lock, open(self._lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            current = self.current()
+            if current is not None and current.started_at >= requested_at:
+                return
+            with self._stamp() as (_, stamp):
+                pass
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                build(tmp, self._generation + 1)
+                # Held across the replace, so an invalidate() either lands before it and
+                # is seen here, or after it and unlinks the file we just published
+                with self._stamp() as (_, latest):
+                    if latest != stamp:
+                        # A write committed while we read; the publish it queued will rebuild
+                        os.unlink(tmp)
+                        self.discarded += 1
+                        return
+                    os.replace(tmp, self.path)
+                self.builds += 1
+            except Exception:
+                # Serving a stale snapshot would be wrong; fall back to the database until the next build
+                for stale in (tmp, self.path):
+                    if os.path.exists(stale):
+                        os.unlink(stale)
+                raise
+            finally:
+                self.current()
+
+    def invalidate(self):
+        """Stop serving the current file, in every worker, until the next publish."""
+        if not self.enabled:
+            return
+        with self._stamp() as (fd, stamp):
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, _STAMP.pack(stamp + 1))
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+        self._current = None
+
+    def stats(self) -> Dict:
+        current = self.current()
+        if current is None:
+            return {"enabled": self.enabled, "generation": None}
+        return {
+            "enabled": self.enabled,
+            "generation": current.generation,
+            "built_at": current.started_at,
+            "events": current.count("event"),
+            "opportunities": current.count("opportunity"),
+        }
+
+
+catalog = CatalogSnapshot()
@@ -0,0 +1,197 @@
+"""Bounded in-process queue for work that follows a commit.
+
+Write handlers call ``queue.enqueue(...)`` after committing and return
+straight away; a pool of worker tasks on the event loop runs the queued
+callables in threads. Tasks with a ``key`` are coalesced: enqueueing a key
+that is already waiting replaces its arguments instead of adding another
+entry, so a burst of writes costs one snapshot rebuild, not one per write.
+
+When the buffer is full new work is shed (counted, never blocking the
+request). Failures are retried with exponential backoff up to
+``TASK_MAX_ATTEMPTS``. On shutdown the queue drains what is left, including
+delayed tasks and retries, for up to ``TASK_DRAIN_SECONDS``. Before the queue
+is started (or after it is stopped), ``enqueue`` runs the task inline, so
+scripts importing main behave as before.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+QUEUE_SIZE = int(os.getenv("TASK_QUEUE_SIZE", "1000"))
+WORKERS = int(os.getenv("TASK_WORKERS", "2"))
+MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+BACKOFF_SECONDS = float(os.getenv("TASK_BACKOFF_SECONDS", "0.5"))
+DRAIN_SECONDS = float(os.getenv("TASK_DRAIN_SECONDS", "10"))
+
+
+class Task:
+    __slots__ = ("name", "fn", "args", "key", "attempt", "enqueued_at")
+
+    def __init__(self, name: str, fn: Callable, args: tuple, key: Optional[str]):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.key = key
+        self.attempt = 0
+        self.enqueued_at = time.monotonic()
+
+
+class TaskQueue:
+    def __init__(self, max_size: int = QUEUE_SIZE, workers: int = WORKERS):
+        self.max_size = max_size
+        self.workers = workers
+        self._queue: Deque[Task] = deque()
+        self._pending: Dict[str, Task] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._available: Optional[asyncio.Semaphore] = None
+        self._workers = []
+        self._scheduled = 0
+        self._in_flight = 0
+        self._attempts = 0
+        self.counts: Counter = Counter()
+        self.failures: Counter = Counter()
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._lag_last = 0.0
+
+    def enqueue(self, name: str, fn: Callable, *args: Any, key: Optional[str] = None, delay: float = 0.0) -> bool:
+        """Queue fn(*args); returns False if the task was shed because the queue is full."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            self._run_inline(name, fn, args)
+            return True
+        with self._lock:
+            if key is not None and key in self._pending:
+                self._pending[key].args = args
+                self.counts["coalesced"] += 1
+                return True
+            if len(self._queue) + self._scheduled >= self.max_size:
+                self.counts["shed"] += 1
+                logger.warning("Task queue full, shedding %s", name)
+                return False
+            task = Task(name, fn, args, key)
+            if key is not None:
+                self._pending[key] = task
+            self.counts["enqueued"] += 1
+            if delay > 0:
+                self._scheduled += 1
+            else:
+                self._queue.append(task)
+        if delay > 0:
+            loop.call_soon_threadsafe(loop.call_later, delay, self._push_scheduled, task)
+        else:
+            loop.call_soon_threadsafe(self._available.release)
+        return True
+
+    def _run_inline(self, name: str, fn: Callable, args: tuple):
+        try:
+            fn(*args)
+            self.counts["processed"] += 1
+        except Exception:
+            self.counts["failed"] += 1
+            self.failures[name] += 1
+            logger.exception("Task %s failed", name)
+
+    def _push_scheduled(self, task: Task):
+        # Runs on the loop thread; lag is measured from when the task became runnable
+        with self._lock:
+            self._scheduled -= 1
+            task.enqueued_at = time.monotonic()
+            self._queue.append(task)
+        self._available.release()
+
+    def _retry(self, task: Task):
+        with self._lock:
+            if len(self._queue) + self._scheduled >= self.max_size:
+                self.counts["shed"] += 1
+                logger.warning("Task queue full, dropping retry of %s", task.name)
+                return
+            self._scheduled += 1
+            self.counts["retried"] += 1
+        self._loop.call_later(BACKOFF_SECONDS * 2 ** (task.attempt - 1), self._push_scheduled, task)
+
+    async def _worker(self):
+        while True:
+            await self._available.acquire()
+            with self._lock:
+                task = self._queue.popleft()
+                # Work enqueued from now on must run again: it may follow a later commit
+                if task.key is not None and self._pending.get(task.key) is task:
+                    del self._pending[task.key]
+                self._in_flight += 1
+            lag = time.monotonic() - task.enqueued_at
+            self._attempts += 1
+            self._lag_last = lag
+            self._lag_max = max(self._lag_max, lag)
+            self._lag_total += lag
+            task.attempt += 1
+            try:
+                await asyncio.to_thread(task.fn, *task.args)
+                self.counts["processed"] += 1
+            except Exception:
+                self.failures[task.name] += 1
+                if task.attempt < MAX_ATTEMPTS:
+                    logger.warning("Task %s failed (attempt %d), retrying", task.name, task.attempt, exc_info=True)
+                    self._retry(task)
+                else:
+                    self.counts["failed"] += 1
+                    logger.exception("Task %s failed after %d attempts", task.name, task.attempt)
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._available = asyncio.Semaphore(0)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = DRAIN_SECONDS):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                idle = not self._queue and not self._scheduled and not self._in_flight
+            if idle:
+                break
+            await asyncio.sleep(0.05)
+        else:
+            logger.warning("Task queue shutdown with %d tasks still queued", len(self._queue) + self._scheduled)
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+        self._loop = None
+
+    def metrics(self) -> dict:
+        with self._lock:
+            oldest = self._queue[0].enqueued_at if self._queue else None
+            depth, scheduled, in_flight = len(self._queue), self._scheduled, self._in_flight
+        return {
+            "running": self._loop is not None,
+            "workers": self.workers,
+            "capacity": self.max_size,
+            "depth": depth,
+            "scheduled": scheduled,
+            "in_flight": in_flight,
+            "oldest_pending_ms": round((time.monotonic() - oldest) * 1000, 3) if oldest is not None else None,
+            "lag_ms": {
+                "last": round(self._lag_last * 1000, 3),
+                "max": round(self._lag_max * 1000, 3),
+                "mean": round(self._lag_total / self._attempts * 1000, 3) if self._attempts else None,
+            },
+            "enqueued": self.counts["enqueued"],
+            "coalesced": self.counts["coalesced"],
+            "processed": self.counts["processed"],
+            "retried": self.counts["retried"],
+            "failed": self.counts["failed"],
+            "shed": self.counts["shed"],
+            "failures_by_task": dict(self.failures),
+        }
+
+
+queue = TaskQueue()
@@ -0,0 +1,49 @@
+import os
+import sys
+import time
+
+# Point the app at a private in-memory database before anything imports database.py
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ["CATALOG_SNAPSHOT"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import tasks
+
+EVENT = {
+    "title": "PyCon", "organization": "PSF", "description": "Python conference", "venue": "Hall",
+    "registration_link": "https://example.com", "start_date": "2030-11-01T10:00:00", "end_date": "2030-11-02T10:00:00",
+    "location": "Online", "type": "Conference", "virtual": True, "tags": ["python"],
+}
+OPPORTUNITY = {
+    "title": "ML RA", "organization": "MIT", "description": "Research assistant", "type": "Research",
+    "location": "Online", "deadline": "2030-12-01T00:00:00", "contact_email": "lab@example.com", "virtual": True,
+    "tags": ["ml"],
+}
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(main.app) as c:
+        yield c
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    client.post("/admin/create", json={"username": "admin", "password": "pw"})
+    token = client.post("/token", data={"username": "admin", "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture
+def quiet_db(client):
+    """Wait out background tasks, which share the single in-memory connection with direct sessions."""
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        metrics = tasks.queue.metrics()
+        if not (metrics["depth"] or metrics["scheduled"] or metrics["in_flight"]):
+            return
+        time.sleep(0.01)
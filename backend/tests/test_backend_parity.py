@@ -0,0 +1,59 @@
+"""The same reads, writes and toggles against SQLite and Postgres must give the same responses.
+
+The scenario lives in compare_backends.py; each backend runs it in a subprocess
+because the engine is bound when main.py is imported. The SQLite run always
+happens; the comparison with Postgres needs a scratch database in POSTGRES_URL,
+which is dropped and recreated.
+"""
+import os
+
+import pytest
+
+import compare_backends
+
+COUNT = 30
+
+
+def _keys():
+    reads = compare_backends.READ_REQUESTS + compare_backends.USER_REQUESTS
+    keys = [f"{path}?{compare_backends.json.dumps(params, sort_keys=True)}" for path, params in reads]
+    keys += [f"#{step} {method.upper()} {path}" for step, (_, method, path, _) in enumerate(compare_backends.WRITE_STEPS)]
+    keys += [
+        f"after writes: {path}?{compare_backends.json.dumps(params, sort_keys=True)}"
+        for path, params in reads + compare_backends.WRITE_READS
+    ]
+    return keys
+
+
+@pytest.fixture(scope="module")
+def sqlite_results(tmp_path_factory):
+    return compare_backends.run_backend(f"sqlite:///{tmp_path_factory.mktemp('parity') / 'parity.db'}", COUNT, 0)
+
+
+@pytest.fixture(scope="module")
+def postgres_results():
+    url = os.getenv("POSTGRES_URL")
+    if not url:
+        pytest.skip("POSTGRES_URL is not set")
+    return compare_backends.run_backend(url, COUNT, 0)
+
+
+def test_scenario_on_sqlite(sqlite_results):
+    assert sorted(sqlite_results) == sorted(_keys())
+    assert all(result["status"] < 500 for result in sqlite_results.values())
+    steps = [sqlite_results[key] for key in _keys() if key.startswith("#")]
+
+    # Repeats are no-ops, save toggles alternate, and a deleted item is gone
+    assert steps[0]["body"]["likes"] == steps[1]["body"]["likes"]
+    assert [steps[n]["body"]["saved"] for n in (7, 8, 9, 18)] == [True, False, True, True]
+    assert [conflict["id"] for conflict in steps[9]["body"]["conflicts"]] == [3]
+    assert steps[15]["body"] == {"affected": 2, "ids": [7, 8]}
+    assert steps[23]["status"] == 404
+    tagged = sqlite_results['after writes: /events/search/?{"tags": ["parity"]}']["body"]
+    assert [item["id"] for item in tagged] == [COUNT + 1, 6, 7, 8]
+
+
+@pytest.mark.parametrize("key", _keys())
+def test_backends_agree(key, sqlite_results, postgres_results):
+    sqlite, postgres = sqlite_results[key], postgres_results[key]
+    assert (sqlite["status"], sqlite["body"]) == (postgres["status"], postgres["body"])
@@ -0,0 +1,93 @@
+import time
+
+from conftest import EVENT
+from test_engagement import _user_headers
+
+import cache
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key) or 0) + 1
+
+
+def test_lru_evicts_least_recently_used_and_expired_entries():
+    lru = cache.LRUCache(max_entries=2, ttl=60)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+    lru.set("c", 3)
+    assert (lru.get("a"), lru.get("b"), lru.get("c")) == (1, None, 3)
+
+    short = cache.LRUCache(max_entries=2, ttl=0.01)
+    short.set("a", 1)
+    time.sleep(0.02)
+    assert short.get("a") is None and len(short) == 0
+
+
+def test_bump_invalidates_only_that_table():
+    results = cache.ResultCache(local=cache.LRUCache())
+    calls = []
+
+    def compute(value):
+        calls.append(value)
+        return value
+
+    assert results.get_or_compute("events", "k", lambda: compute(1)) == 1
+    assert results.get_or_compute("events", "k", lambda: compute(2)) == 1
+    assert results.get_or_compute("opportunities", "k", lambda: compute(3)) == 3
+    results.bump("events")
+    assert results.get_or_compute("events", "k", lambda: compute(4)) == 4
+    assert results.get_or_compute("opportunities", "k", lambda: compute(5)) == 3
+    assert calls == [1, 3, 4]
+    assert (results.hits, results.misses) == (2, 3)
+
+
+def test_shared_tier_versions_are_seen_by_every_worker():
+    shared = _FakeRedis()
+    first = cache.ResultCache(local=cache.LRUCache(), shared=shared)
+    second = cache.ResultCache(local=cache.LRUCache(), shared=shared)
+    assert first.get_or_compute("events", "k", lambda: [1]) == [1]
+    # Filled from the shared tier without computing
+    assert second.get_or_compute("events", "k", lambda: [2]) == [1]
+    first.bump("events")
+    assert second.get_or_compute("events", "k", lambda: [3]) == [3]
+    # A local-only bump (a message from another worker) leaves the shared version alone
+    second.bump("events", local_only=True)
+    assert shared.get("research_hub:version:events") == 1
+
+
+def test_make_key_ignores_unset_parameters_and_tag_order():
+    assert cache.make_key("events", tags=["b", "a"], query=None) == cache.make_key("events", tags=["a", "b"], skip=None)
+    assert cache.make_key("events", skip=0) != cache.make_key("events", skip=20)
+
+
+def test_cached_lists_and_searches_show_new_counters(client, admin_headers):
+    tag = "cache-probe"
+    quiet = client.post("/events/", json={**EVENT, "tags": [tag]}, headers=admin_headers).json()
+    popular = client.post("/events/", json={**EVENT, "tags": [tag]}, headers=admin_headers).json()
+    params = {"sort_by": "likes", "sort_order": "desc", "limit": 1000}
+
+    def likes(items):
+        return {item["id"]: item["likes"] for item in items if item["id"] in (quiet["id"], popular["id"])}
+
+    # Fill the cache before the like
+    assert likes(client.get("/events/", params=params).json()) == {quiet["id"]: 0, popular["id"]: 0}
+    assert likes(client.get("/events/search/", params={"tags": tag}).json()) == {quiet["id"]: 0, popular["id"]: 0}
+
+    client.post(f"/events/{popular['id']}/like", headers=_user_headers(client, "cacheprobe"))
+
+    ordered = [item["id"] for item in client.get("/events/", params=params).json() if item["id"] in (quiet["id"], popular["id"])]
+    assert ordered == [popular["id"], quiet["id"]]
+    assert likes(client.get("/events/", params=params).json()) == {quiet["id"]: 0, popular["id"]: 1}
+    assert likes(client.get("/events/search/", params={"tags": tag}).json()) == {quiet["id"]: 0, popular["id"]: 1}
+    assert likes(client.get("/events/", params={"sort_by": "created_at", "limit": 1000}).json())[popular["id"]] == 1
@@ -0,0 +1,96 @@
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+
+import models
+import send_digests
+from database import SessionLocal
+
+
+def _opportunity(db, title, created_at, id=None):
+    opportunity = models.ResearchOpportunity(
+        id=id, title=title, organization="Lab", description="d", type="Research", location="Online",
+        contact_email="lab@example.com", deadline=datetime(2031, 1, 1), tags=["digest-topic"], created_at=created_at,
+    )
+    db.add(opportunity)
+    db.commit()
+    return opportunity.id
+
+
+def _digested(db, user_id):
+    return [
+        title for payload, in db.query(models.Outbox.payload).filter(models.Outbox.user_id == user_id, models.Outbox.kind == "digest")
+        for title in sorted(item["title"] for item in json.loads(payload)["opportunities"])
+    ]
+
+
+def _first_run(db):
+    db.query(models.JobCheckpoint).delete()
+    db.commit()
+    send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+
+
+def test_first_run_starts_after_the_existing_catalog(quiet_db):
+    db = SessionLocal()
+    try:
+        user = models.User(email="newcomer@example.com", username="newcomer", hashed_password="x", interests=["digest-topic"])
+        db.add(user)
+        db.commit()
+        _opportunity(db, "existing", datetime.utcnow() - timedelta(days=30))
+        _opportunity(db, "just before", datetime.utcnow())
+        _first_run(db)
+        assert _digested(db, user.id) == []
+
+        _opportunity(db, "new", datetime.utcnow())
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        assert _digested(db, user.id) == ["new"]
+    finally:
+        db.close()
+
+
+def test_late_commit_with_older_created_at_is_sent_once(quiet_db):
+    db = SessionLocal()
+    try:
+        user = models.User(email="reader@example.com", username="reader", hashed_password="x", interests=["digest-topic"])
+        db.add(user)
+        db.commit()
+        _first_run(db)
+        now = datetime.utcnow()
+        first = _opportunity(db, "first", now, id=(db.query(func.max(models.ResearchOpportunity.id)).scalar() or 0) + 10)
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        assert _digested(db, user.id) == ["first"]
+
+        # Took its id and timestamp before "first" but committed after the run above
+        _opportunity(db, "late", now - timedelta(seconds=5), id=first - 5)
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        assert _digested(db, user.id) == ["first", "late"]
+    finally:
+        db.close()
+
+
+def test_second_run_exits_while_the_first_holds_the_job(quiet_db):
+    db = SessionLocal()
+    try:
+        user = models.User(email="waiter@example.com", username="waiter", hashed_password="x", interests=["digest-topic"])
+        db.add(user)
+        db.commit()
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        checkpoint = db.get(models.JobCheckpoint, send_digests.JOB_NAME)
+        checkpoint.owner, checkpoint.heartbeat_at = "other", datetime.utcnow()
+        db.commit()
+
+        _opportunity(db, "contested", datetime.utcnow())
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        assert _digested(db, user.id) == []
+
+        # The owner stopped making progress: the next run takes over
+        checkpoint.heartbeat_at = datetime.utcnow() - send_digests.LEASE
+        db.commit()
+        send_digests.send_digests(workers=0, chunk_size=100, max_items=10)
+        assert _digested(db, user.id) == ["contested"]
+        db.refresh(checkpoint)
+        assert checkpoint.owner is None
+    finally:
+        db.close()
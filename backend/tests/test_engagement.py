@@ -0,0 +1,101 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine, inspect, text
+
+from conftest import EVENT
+
+import engagement
+import migrate_engagement_bitmaps
+import models
+from bitmaps import RoaringBitmap
+from database import SessionLocal
+
+
+def _user_headers(client, name):
+    client.post("/users/", json={"email": f"{name}@example.com", "username": name, "password": "pw", "full_name": name})
+    token = client.post("/token", data={"username": name, "password": "pw"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_like_keeps_counts_from_before_per_user_tracking(client, admin_headers):
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    db = SessionLocal()
+    try:
+        db.query(models.TechEvent).filter(models.TechEvent.id == event["id"]).update({"likes": 500})
+        db.commit()
+    finally:
+        db.close()
+    headers = _user_headers(client, "historian")
+    client.post(f"/events/{event['id']}/like", headers=headers)
+    client.post(f"/events/{event['id']}/like", headers=headers)
+    assert client.get(f"/events/{event['id']}", headers=headers).json()["likes"] == 501
+
+
+def test_deleted_item_bitmaps_do_not_carry_over_to_a_reused_id(client, admin_headers):
+    headers = _user_headers(client, "recycler")
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    client.post(f"/events/{event['id']}/like", headers=headers)
+    client.delete(f"/events/{event['id']}", headers=admin_headers)
+    db = SessionLocal()
+    try:
+        # SQLite hands out the deleted id again; create the replacement with it explicitly either way
+        db.add(models.TechEvent(id=event["id"], title="Reused", organization="X", description="d", venue="v",
+                                registration_link="l", start_date=datetime(2030, 1, 1), end_date=datetime(2030, 1, 2),
+                                location="Online", type="Meetup", virtual=True))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get(f"/events/{event['id']}", headers=headers).json()["is_liked"] is False
+    assert client.post(f"/events/{event['id']}/like", headers=headers).status_code == 200
+    assert client.get(f"/events/{event['id']}", headers=headers).json()["likes"] == 1
+
+
+def test_each_action_rewrites_only_its_users_container(client, admin_headers):
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    bitmap = models.EngagementBitmap
+    db = SessionLocal()
+    try:
+        assert engagement.track(db, "event", event["id"], "like", 7, baseline=500) == (True, 501)
+        db.commit()
+        before = db.query(bitmap.users, bitmap.version).filter(bitmap.item_id == event["id"], bitmap.container == 0).one()
+        far = (3 << 16) | 7
+        assert engagement.track(db, "event", event["id"], "like", far, baseline=501) == (True, 502)
+        assert engagement.track(db, "event", event["id"], "like", 7, baseline=502) == (False, 502)
+        db.commit()
+        rows = {
+            row.container: row for row in
+            db.query(bitmap).filter(bitmap.item_type == "event", bitmap.item_id == event["id"], bitmap.action == "like")
+        }
+        assert {container: (row.baseline, row.cardinality) for container, row in rows.items()} == {0: (500, 1), 3: (0, 1)}
+        assert (rows[0].users, rows[0].version) == tuple(before)
+        assert engagement.viewer_flags(db, "event", [event["id"]], far)["is_liked"] == {event["id"]}
+        assert engagement.viewer_flags(db, "event", [event["id"]], far + 1)["is_liked"] == set()
+    finally:
+        db.close()
+
+
+def test_migration_splits_whole_bitmaps_into_containers(tmp_path, monkeypatch):
+    old = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with old.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE engagement_bitmaps (item_type VARCHAR, item_id INTEGER, action VARCHAR, users BLOB NOT NULL, "
+            "cardinality INTEGER NOT NULL, version INTEGER NOT NULL, updated_at DATETIME, "
+            "PRIMARY KEY (item_type, item_id, action))"
+        ))
+        conn.execute(text("INSERT INTO engagement_bitmaps VALUES ('event', 1, 'like', :users, 3, 5, NULL)"),
+                     {"users": RoaringBitmap([1, 2, (2 << 16) | 1]).serialize()})
+        conn.execute(text("INSERT INTO engagement_bitmaps VALUES ('event', 2, 'like', '', 0, 1, NULL)"))
+    monkeypatch.setattr(migrate_engagement_bitmaps, "engine", old)
+    migrate_engagement_bitmaps.migrate_engagement_bitmaps()
+
+    with old.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT item_id, container, users, cardinality, baseline, version FROM engagement_bitmaps ORDER BY item_id, container"
+        )).all()
+    assert [(item_id, container, sorted(RoaringBitmap.deserialize(users)), cardinality, version)
+            for item_id, container, users, cardinality, _, version in rows] == [
+        (1, 0, [1, 2], 2, 5), (1, 2, [(2 << 16) | 1], 1, 5), (2, 0, [], 0, 1),
+    ]
+    assert inspect(old).get_pk_constraint("engagement_bitmaps")["constrained_columns"] == [
+        "item_type", "item_id", "action", "container",
+    ]
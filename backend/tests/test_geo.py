@@ -0,0 +1,23 @@
+from conftest import EVENT
+
+import geo
+
+
+def test_geocode_finds_the_city_behind_a_venue():
+    assert geo.geocode("Boston University, Boston, MA") == geo.geocode("Boston, MA")
+    assert geo.geocode("MIT, Cambridge, MA") == geo.geocode("Cambridge, MA")
+    assert geo.geocode("Cambridge, UK") != geo.geocode("Cambridge, MA")
+    assert geo.geocode("NYC") == geo.geocode("New York City") == geo.geocode("New York, NY")
+    assert geo.geocode("Somewhere Unknown") is None
+
+
+def test_location_search_keeps_rows_without_coordinates(client, admin_headers):
+    located = {**EVENT, "virtual": False, "location": "Boston University, Boston, MA", "title": "Located"}
+    unlocated = {**EVENT, "virtual": False, "location": "Harvard Square Boston", "title": "Unlocated"}
+    far = {**EVENT, "virtual": False, "location": "Chicago, IL", "title": "Far"}
+    for event in (located, unlocated, far):
+        client.post("/events/", json=event, headers=admin_headers)
+    results = client.get("/events/search/", params={"location": "Boston"}).json()
+    titles = [event["title"] for event in results]
+    assert "Located" in titles and "Unlocated" in titles and "Far" not in titles
+    assert titles.index("Located") < titles.index("Unlocated")
@@ -0,0 +1,17 @@
+from intervals import overlapping_pairs
+
+
+def test_touching_intervals_do_not_overlap():
+    assert overlapping_pairs([(10, 12, "a"), (12, 14, "b")]) == []
+    assert overlapping_pairs([(10, 12, "a"), (11, 14, "b"), (13, 15, "c")]) == [("a", "b"), ("b", "c")]
+
+
+def test_instants_conflict_only_with_intervals_strictly_containing_them():
+    assert overlapping_pairs([(10, 12, "a"), (11, 11, "now")]) == [("a", "now")]
+    assert overlapping_pairs([(10, 12, "a"), (10, 10, "start"), (12, 12, "end")]) == []
+    assert overlapping_pairs([(11, 11, "x"), (11, 11, "y")]) == []
+
+
+def test_every_pair_is_reported_once():
+    pairs = overlapping_pairs([(0, 10, key) for key in range(4)])
+    assert sorted(tuple(sorted(pair)) for pair in pairs) == [(a, b) for a in range(4) for b in range(a + 1, 4)]
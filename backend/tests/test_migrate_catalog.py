@@ -0,0 +1,24 @@
+from sqlalchemy import create_engine, inspect, text
+
+import migrate_catalog
+
+
+def test_adds_missing_columns_and_indexes_to_old_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        for table in migrate_catalog.TABLES:
+            conn.execute(text(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, title VARCHAR)"))
+            conn.execute(text(f"INSERT INTO {table} (id, title) VALUES (1, 'old')"))
+
+    migrate_catalog.migrate_catalog(engine)
+    # A second run finds nothing left to do
+    migrate_catalog.migrate_catalog(engine)
+
+    for table in migrate_catalog.TABLES:
+        columns = {column["name"] for column in inspect(engine).get_columns(table)}
+        indexes = {index["name"] for index in inspect(engine).get_indexes(table)}
+        for name, _, indexed in migrate_catalog.COLUMNS:
+            assert name in columns
+            assert not indexed or f"ix_{table}_{name}" in indexes
+        with engine.connect() as conn:
+            assert tuple(conn.execute(text(f"SELECT trending_score, is_active FROM {table}")).one()) == (0, 1)
@@ -0,0 +1,48 @@
+from conftest import EVENT, OPPORTUNITY
+
+
+def test_patch_event_rejects_null_for_required_column(client, admin_headers):
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    response = client.patch(f"/events/{event['id']}", json={"title": None}, headers=admin_headers)
+    assert response.status_code == 422
+    assert client.get(f"/events/{event['id']}").json()["title"] == "PyCon"
+
+
+def test_patch_event_allows_clearing_nullable_column(client, admin_headers):
+    event = client.post("/events/", json={**EVENT, "price": "$10"}, headers=admin_headers).json()
+    response = client.patch(f"/events/{event['id']}", json={"price": None}, headers=admin_headers)
+    assert response.status_code == 200
+    assert response.json()["price"] is None
+
+
+def test_bulk_update_events_rejects_null_tags(client, admin_headers):
+    ids = [client.post("/events/", json=EVENT, headers=admin_headers).json()["id"] for _ in range(2)]
+    response = client.patch("/admin/events/bulk", json={"ids": ids, "tags": None}, headers=admin_headers)
+    assert response.status_code == 422
+    assert client.get("/events/search/", params={"tags": "python"}).status_code == 200
+    assert client.get("/events/", params={"sort_by": "likes"}).status_code == 200
+
+
+def test_opportunity_updates_reject_nulls(client, admin_headers):
+    opportunity = client.post("/opportunities/", json=OPPORTUNITY, headers=admin_headers).json()
+    assert client.patch(f"/opportunities/{opportunity['id']}", json={"deadline": None}, headers=admin_headers).status_code == 422
+    assert client.patch("/admin/opportunities/bulk", json={"ids": [opportunity["id"]], "tags": None}, headers=admin_headers).status_code == 422
+    response = client.patch(f"/opportunities/{opportunity['id']}", json={"compensation": None}, headers=admin_headers)
+    assert response.status_code == 200
+
+
+def test_deactivated_items_are_hidden_from_details_and_stats(client, admin_headers):
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    opportunity = client.post("/opportunities/", json=OPPORTUNITY, headers=admin_headers).json()
+    events_before = client.get("/events/stats/").json()["total_events"]
+    opportunities_before = client.get("/opportunities/stats/").json()["total_opportunities"]
+
+    assert client.patch(f"/events/{event['id']}", json={"is_active": False}, headers=admin_headers).status_code == 200
+    assert client.patch(f"/opportunities/{opportunity['id']}", json={"is_active": False}, headers=admin_headers).status_code == 200
+
+    assert client.get(f"/events/{event['id']}").status_code == 404
+    assert client.get(f"/opportunities/{opportunity['id']}").status_code == 404
+    assert client.get(f"/events/{event['id']}", headers=admin_headers).json()["is_active"] is False
+    assert client.get(f"/opportunities/{opportunity['id']}", headers=admin_headers).json()["is_active"] is False
+    assert client.get("/events/stats/").json()["total_events"] == events_before - 1
+    assert client.get("/opportunities/stats/").json()["total_opportunities"] == opportunities_before - 1
@@ -0,0 +1,53 @@
+import threading
+import time
+
+import profiling
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _unrelated_request(stop):
+    while not stop.is_set():
+        _spin(0.001)
+
+
+def get(seconds):
+    # Named like LRUCache.get and CatalogSnapshot.get
+    _spin(seconds)
+
+
+def test_only_the_requests_threads_are_sampled():
+    stop = threading.Event()
+    other = threading.Thread(target=_unrelated_request, args=(stop,), daemon=True)
+    other.start()
+    profile = profiling.RequestProfile("GET", "/events/")
+    profile.threads.add(threading.get_ident())
+    profile.start()
+    try:
+        get(0.2)
+    finally:
+        profile.stop()
+        stop.set()
+        other.join()
+    assert profile.stacks
+    assert not any("_unrelated_request" in stack for stack in profile.stacks)
+    assert any("test_profiling.py:get:" in stack for stack in profile.stacks)
+
+
+def test_sync_endpoint_thread_is_tracked_only_while_it_runs():
+    profile = profiling.RequestProfile("GET", "/events/")
+    seen = []
+    endpoint = profiling.track_thread(lambda: seen.append(threading.get_ident() in profile.threads))
+    reset = profiling._active.set(profile)
+    try:
+        thread = threading.Thread(target=profiling.contextvars.copy_context().run, args=(endpoint,))
+        thread.start()
+        thread.join()
+    finally:
+        profiling._active.reset(reset)
+    assert seen == [True]
+    assert profile.threads == set()
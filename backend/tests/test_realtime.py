@@ -0,0 +1,20 @@
+import asyncio
+import json
+
+import realtime
+
+
+def test_catalog_message_does_not_replace_pending_counters():
+    async def run():
+        hub = realtime.Hub(interval=60)
+        hub._loop = asyncio.get_running_loop()
+        subscriber = hub.subscribe([realtime.item_topic("event", 1)])
+        hub.publish({"topic": "event:1", "type": "counters", "kind": "event", "id": 1, "likes": 98})
+        hub.publish({"topic": "event:1", "type": "counters", "kind": "event", "id": 1, "likes": 99})
+        hub.publish({"topic": "event:1", "type": "catalog", "kind": "event", "id": 1, "action": "updated"})
+        hub._flush()
+        return [json.loads(subscriber.queue.get_nowait()) for _ in range(subscriber.queue.qsize())]
+
+    messages = asyncio.run(run())
+    assert sorted(m["type"] for m in messages) == ["catalog", "counters"]
+    assert next(m for m in messages if m["type"] == "counters")["likes"] == 99
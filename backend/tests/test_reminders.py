@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import models
+import reminders
+from database import SessionLocal
+
+
+def test_reminder_is_not_popped_before_it_is_due():
+    scheduler = reminders.ReminderScheduler()
+    scheduler._heap = [reminders.pack(datetime(2030, 1, 1, 12, 0, 0, 300_000), 1, 2)]
+    assert scheduler.pop_due(datetime(2030, 1, 1, 12, 0, 0, 100_000), 10) == []
+    assert scheduler.pop_due(datetime(2030, 1, 1, 12, 0, 0, 300_000), 10) == []
+    assert scheduler.pop_due(datetime(2030, 1, 1, 12, 0, 1), 10) == [(1, 2)]
+
+
+def test_sub_second_due_time_is_sent_once_due(client):
+    db = SessionLocal()
+    try:
+        opportunity = models.ResearchOpportunity(title="Grant", organization="NSF", description="d", type="Grant",
+                                                 location="Online", contact_email="grants@example.com", deadline=datetime(2030, 1, 5))
+        db.add(opportunity)
+        db.flush()
+        due = datetime(2030, 1, 1, 12, 0, 0, 300_000)
+        db.add(models.Reminder(user_id=7, opportunity_id=opportunity.id, due_at=due))
+        db.commit()
+
+        scheduler = reminders.ReminderScheduler()
+        scheduler.load(db)
+        scheduler.dispatch(db, datetime(2030, 1, 1, 12, 0, 0, 100_000))
+        scheduler.dispatch(db, datetime(2030, 1, 1, 12, 0, 1))
+        sent = db.query(models.Outbox).filter(models.Outbox.kind == "reminder", models.Outbox.user_id == 7).count()
+        assert sent == 1
+        assert db.get(models.Reminder, (7, opportunity.id)).sent_at is not None
+    finally:
+        db.close()
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from conftest import EVENT
+from test_engagement import _user_headers
+
+import models
+from database import SessionLocal
+
+
+def _event(client, admin_headers, start, end):
+    return client.post(
+        "/events/", json={**EVENT, "start_date": f"2031-03-01T{start}:00", "end_date": f"2031-03-01T{end}:00"},
+        headers=admin_headers,
+    ).json()["id"]
+
+
+def test_save_check_and_schedule_agree_on_conflicts(client, admin_headers):
+    headers = _user_headers(client, "planner")
+    morning = _event(client, admin_headers, "10:00", "12:00")
+    overlapping = _event(client, admin_headers, "11:00", "13:00")
+    touching = _event(client, admin_headers, "13:00", "14:00")
+    inverted = _event(client, admin_headers, "11:30", "12:30")
+    db = SessionLocal()
+    try:
+        # Ends before it starts: counts as an instant at 11:30
+        db.query(models.TechEvent).filter(models.TechEvent.id == inverted).update({"end_date": datetime(2031, 3, 1, 9)})
+        db.commit()
+    finally:
+        db.close()
+
+    def save(event_id):
+        response = client.post(f"/users/me/save-event/{event_id}", headers=headers).json()
+        assert response["saved"]
+        return [conflict["id"] for conflict in response["conflicts"]]
+
+    assert save(morning) == []
+    assert save(overlapping) == [morning]
+    assert save(touching) == []
+    assert save(inverted) == [morning, overlapping]
+
+    schedule = client.get("/users/me/schedule", headers=headers).json()
+    assert [entry["event"]["id"] for entry in schedule] == [morning, overlapping, inverted, touching]
+    assert {entry["event"]["id"]: entry["conflicts"] for entry in schedule} == {
+        morning: sorted([overlapping, inverted]),
+        overlapping: sorted([morning, inverted]),
+        inverted: sorted([morning, overlapping]),
+        touching: [],
+    }
+
+    # Unsaving toggles it back out of both
+    assert not client.post(f"/users/me/save-event/{overlapping}", headers=headers).json()["saved"]
+    assert save(overlapping) == [morning, inverted]
@@ -0,0 +1,56 @@
+import threading
+
+import similarity
+
+PYTHON = similarity.tokens("Python meetup", tag=["python", "web"])
+
+
+class _StubIndex(similarity.SimilarityIndex):
+    """Reads rows from a dict instead of the database; on_read runs in the middle of each read."""
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+        self.on_read = lambda: None
+
+    def _rows(self, db, kind, ids=None):
+        self.on_read()
+        for item_id, token_set in self.rows.get(kind, {}).items():
+            if ids is None or item_id in ids:
+                yield item_id, token_set
+
+
+def test_items_marked_during_a_rebuild_stay_dirty():
+    index = _StubIndex({"event": {1: PYTHON, 2: PYTHON}})
+    index.on_read = lambda: index.mark_dirty("event", [2])
+    index.rebuild(None)
+    assert index._dirty["event"] == {2}
+
+    index.on_read = lambda: None
+    index.rows["event"][2] = similarity.tokens("Rust night", tag=["rust"])
+    assert index.similar(None, "event", 1) == []
+
+
+def test_lookups_are_not_blocked_by_a_refresh_reading_the_database():
+    index = _StubIndex({"event": {1: PYTHON, 2: PYTHON}})
+    index.rebuild(None)
+    reading, release = threading.Event(), threading.Event()
+
+    def slow_read():
+        reading.set()
+        release.wait(5)
+
+    index.on_read = slow_read
+    index.mark_dirty("event", [2])
+    refresh = threading.Thread(target=index.refresh, args=(None, "event"))
+    refresh.start()
+    try:
+        assert reading.wait(5)
+        result = []
+        lookup = threading.Thread(target=lambda: result.append(index.similar(None, "event", 1)))
+        lookup.start()
+        lookup.join(1)
+        assert result == [[(2, 1.0)]]
+    finally:
+        release.set()
+        refresh.join()
@@ -0,0 +1,20 @@
+import slow_queries
+
+
+def test_plain_reads_are_analyzed():
+    assert slow_queries.analyze_safe(
+        "SELECT count(*) AS count_1, coalesce(sum(tech_events.likes), %(param_1)s) FROM tech_events "
+        "WHERE tech_events.is_active IS NOT true AND lower(tech_events.location) LIKE lower(%(location_1)s)"
+    )
+    assert slow_queries.analyze_safe("SELECT id FROM t WHERE note = 'select pg_notify(x) for update'")
+
+
+def test_locking_writing_and_side_effect_selects_are_not_analyzed():
+    assert not slow_queries.analyze_safe(
+        "SELECT reminders.user_id FROM reminders WHERE reminders.user_id IN (%(user_id_1_1)s) FOR UPDATE"
+    )
+    assert not slow_queries.analyze_safe("SELECT * FROM job_checkpoints FOR NO KEY UPDATE SKIP LOCKED")
+    assert not slow_queries.analyze_safe("SELECT * FROM t FOR SHARE")
+    assert not slow_queries.analyze_safe("SELECT pg_notify(%(channel)s, %(payload)s)")
+    assert not slow_queries.analyze_safe("SELECT nextval('tech_events_id_seq')")
+    assert not slow_queries.analyze_safe("SELECT * INTO scratch FROM tech_events")
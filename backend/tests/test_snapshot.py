@@ -0,0 +1,48 @@
+from conftest import EVENT, OPPORTUNITY
+from test_engagement import _user_headers
+
+import snapshot
+
+
+def _enabled_catalog(monkeypatch, tmp_path):
+    catalog = snapshot.CatalogSnapshot(str(tmp_path), enabled=True)
+    monkeypatch.setattr(snapshot, "catalog", catalog)
+    return catalog
+
+
+def test_counters_are_served_live_without_a_rebuild(client, admin_headers, monkeypatch, tmp_path):
+    catalog = _enabled_catalog(monkeypatch, tmp_path)
+    event = client.post("/events/", json=EVENT, headers=admin_headers).json()
+    opportunity = client.post("/opportunities/", json=OPPORTUNITY, headers=admin_headers).json()
+    catalog.publish()
+    generation = catalog.current().generation
+
+    headers = _user_headers(client, "counter")
+    assert client.post(f"/events/{event['id']}/like", headers=headers).status_code == 200
+    assert client.post(f"/opportunities/{opportunity['id']}/apply", headers=headers).status_code == 200
+
+    assert client.get(f"/events/{event['id']}").json()["likes"] == 1
+    assert [item["likes"] for item in client.get("/events/?limit=1000").json() if item["id"] == event["id"]] == [1]
+    detail = client.get(f"/opportunities/{opportunity['id']}", headers=headers).json()
+    assert (detail["applications"], detail["has_applied"]) == (1, True)
+    assert catalog.current().generation == generation
+
+
+def test_build_racing_a_commit_is_not_published(client, admin_headers, monkeypatch, tmp_path):
+    catalog = _enabled_catalog(monkeypatch, tmp_path)
+    client.post("/events/", json=EVENT, headers=admin_headers)
+    build = snapshot.build
+
+    def build_then_commit_elsewhere(path, generation):
+        build(path, generation)
+        # Another worker commits and invalidates after our read, before our replace
+        catalog.invalidate()
+
+    monkeypatch.setattr(snapshot, "build", build_then_commit_elsewhere)
+    catalog.publish()
+    assert catalog.current() is None
+    assert catalog.discarded == 1
+
+    monkeypatch.setattr(snapshot, "build", build)
+    catalog.publish()
+    assert catalog.current() is not None